@@ -0,0 +1,260 @@
+#!/usr/bin/python3
+
+#
+# benchmark for slnviz
+# generates synthetic solutions and project-files on disk, and times
+# every phase of the slnviz pipeline separately.
+#
+
+from argparse import ArgumentParser
+import bisect
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+import uuid
+
+import slnviz
+
+phases = [
+    "get_lines_from_file",
+    "analyze_projects_in_solution",
+    "remove_transitive_dependencies",
+    "filter_projects",
+    "highlight_projects",
+    "render_dot_file",
+]
+
+
+def get_guid(rnd):
+    return str(uuid.UUID(int=rnd.getrandbits(128), version=4)).upper()
+
+
+def generate_solution(directory, projects=100, fanout=4, depth=8, diamonds=0.3, missing=0.0, seed=0):
+    # writes a solution with the given number of projects, spread over
+    # depth layers. every project references up to fanout projects in
+    # deeper layers. diamonds is the share of references which point to a
+    # project already reachable through another reference, and missing is
+    # the share of references pointing to projects not in the solution.
+    rnd = random.Random(seed)
+    ids = [get_guid(rnd) for i in range(projects)]
+    names = ["Layer{0}.Group{1}.Project{2}".format(i * depth // projects, i % 10, i) for i in range(projects)]
+    layers = [i * depth // projects for i in range(projects)]
+    references = [[] for i in range(projects)]
+
+    # deepest layer first, so the references of every deeper project are
+    # known when choosing diamond-shaped references
+    for i in reversed(range(projects)):
+        # layers are in ascending order, so all deeper projects follow the
+        # last project of this layer
+        deeper = range(bisect.bisect_right(layers, layers[i]), projects)
+        for n in range(rnd.randint(0, fanout)):
+            if rnd.random() < missing:
+                references[i].append(get_guid(rnd))
+                continue
+
+            indirect = [k for j in references[i] if isinstance(j, int) for k in references[j] if isinstance(k, int)]
+            if indirect and rnd.random() < diamonds:
+                dep = rnd.choice(indirect)
+            elif deeper:
+                dep = rnd.choice(deeper)
+            else:
+                continue
+
+            if dep not in references[i]:
+                references[i].append(dep)
+
+    lines = [
+        "",
+        "Microsoft Visual Studio Solution File, Format Version 12.00",
+        "# Visual Studio 15",
+    ]
+    for i in range(projects):
+        filename = "{0}\\{0}.csproj".format(names[i])
+        lines.append("Project(\"{{FAE04EC0-301F-11D3-BF4B-00C04F79EFBC}}\") = \"{0}\", \"{1}\", \"{{{2}}}\"".format(names[i], filename, ids[i]))
+        lines.append("EndProject")
+
+    lines.append("Global")
+    lines.append("\tGlobalSection(ProjectConfigurationPlatforms) = postSolution")
+    for i in range(projects):
+        for configuration in ["Debug", "Release"]:
+            lines.append("\t\t{{{0}}}.{1}|Any CPU.ActiveCfg = {1}|Any CPU".format(ids[i], configuration))
+            lines.append("\t\t{{{0}}}.{1}|Any CPU.Build.0 = {1}|Any CPU".format(ids[i], configuration))
+    lines.append("\tEndGlobalSection")
+    lines.append("EndGlobal")
+
+    sln_file = os.path.join(directory, "Synthetic.sln")
+    with open(sln_file, "w") as f:
+        f.write("\n".join(lines))
+
+    for i in range(projects):
+        project_dir = os.path.join(directory, names[i])
+        os.makedirs(project_dir)
+        with open(os.path.join(project_dir, names[i] + ".csproj"), "w") as f:
+            f.write("<?xml version=\"1.0\" encoding=\"utf-8\"?>\n")
+            f.write("<Project ToolsVersion=\"15.0\" xmlns=\"http://schemas.microsoft.com/developer/msbuild/2003\">\n")
+            f.write("  <PropertyGroup>\n    <ProjectGuid>{{{0}}}</ProjectGuid>\n  </PropertyGroup>\n".format(ids[i]))
+            f.write("  <ItemGroup>\n")
+            for dep in references[i]:
+                if isinstance(dep, int):
+                    f.write("    <ProjectReference Include=\"..\\{0}\\{0}.csproj\">\n".format(names[dep]))
+                    f.write("      <Project>{{{0}}}</Project>\n".format(ids[dep].lower()))
+                    f.write("      <Name>{0}</Name>\n".format(names[dep]))
+                else:
+                    f.write("    <ProjectReference Include=\"..\\Missing\\Missing.csproj\">\n")
+                    f.write("      <Project>{{{0}}}</Project>\n".format(dep.lower()))
+                f.write("    </ProjectReference>\n")
+            f.write("  </ItemGroup>\n</Project>\n")
+
+    return sln_file
+
+
+def count_edges(projects):
+    return sum(len(project.dependant_projects) for project in projects)
+
+
+def run_pipeline(sln_file, timings, jobs=1):
+    # runs every phase once, and adds its duration to timings
+    def timed(phase, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings[phase].append(time.perf_counter() - start)
+        return result
+
+    lines = timed("get_lines_from_file", lambda file: list(slnviz.get_lines_from_file(file)), sln_file)
+    projects = timed("analyze_projects_in_solution", slnviz.analyze_projects_in_solution,
+                     lines, jobs, None, slnviz.get_solution_dir(sln_file))
+    edges = count_edges(projects)
+    timed("remove_transitive_dependencies", slnviz.remove_transitive_dependencies, projects)
+    reduced_edges = count_edges(projects)
+    filtered = timed("filter_projects", slnviz.filter_projects, re.compile(".*group0.*"), projects)
+    timed("highlight_projects", slnviz.highlight_projects, re.compile(".*group1.*"), filtered)
+    timed("render_dot_file", slnviz.render_dot_file, filtered, True)
+
+    return {
+        "projects": len(projects),
+        "edges": edges,
+        "reduced_edges": reduced_edges,
+    }
+
+
+def get_peak_rss():
+    # peak resident set size of this process in bytes, or None where it
+    # can't be found. on linux, ru_maxrss also covers the process it was
+    # started from, so the peak of its own memory is read from /proc.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except IOError:
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS, and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+
+def run_memory(sln_file, jobs=1):
+    # loads and reduces the solution, in a process of its own, so that the
+    # peak is not hidden by earlier runs.
+    slnviz.logger.stream = sys.stderr
+    before = get_peak_rss()
+    graph = slnviz.load_solution(sln_file, False, jobs)
+    after = get_peak_rss()
+
+    return {
+        "projects": len(graph.projects),
+        "rss_before": before,
+        "peak_rss": after,
+        "peak_rss_graph": after - before if before is not None else None,
+    }
+
+
+def measure_memory(sln_file, jobs=1):
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(run_memory, (sln_file, jobs))
+
+
+def run_benchmark(parameters, repeat=3, jobs=1, memory=False):
+    with tempfile.TemporaryDirectory() as directory:
+        sln_file = generate_solution(directory, **parameters)
+
+        timings = dict((phase, []) for phase in phases)
+        for i in range(repeat):
+            counts = run_pipeline(sln_file, timings, jobs)
+
+        if memory:
+            peak = measure_memory(sln_file, jobs)
+
+    result = {
+        "parameters": parameters,
+        "counts": counts,
+        "phases": dict((phase, {
+            "min": min(durations),
+            "mean": sum(durations) / len(durations),
+        }) for phase, durations in timings.items()),
+    }
+    if memory:
+        result["memory"] = peak
+    return result
+
+
+def main():
+    p = ArgumentParser(description="Benchmark slnviz on synthetic solutions")
+    p.add_argument("--projects", "-p", type=int, nargs="+", default=[100, 500, 1500],
+                   help="Number of projects in each generated solution")
+    p.add_argument("--fanout", type=int, default=4, help="Maximum number of references per project")
+    p.add_argument("--depth", type=int, default=8, help="Number of layers projects are spread over")
+    p.add_argument("--diamonds", type=float, default=0.3,
+                   help="Share of references to projects already reachable through another reference")
+    p.add_argument("--missing", type=float, default=0.02, help="Share of references to missing projects")
+    p.add_argument("--seed", type=int, default=0, help="Seed for the generated solutions")
+    p.add_argument("--repeat", "-r", type=int, default=3, help="Number of times to run every phase")
+    p.add_argument("--jobs", "-j", type=int, default=1, help="Number of project-files to parse in parallel")
+    p.add_argument("--memory", action="store_true",
+                   help="Measure the peak memory of loading every solution, in a separate process")
+    p.add_argument("--output", "-o", help="Write results as JSON to this file, instead of stdout")
+
+    args = p.parse_args()
+
+    # keep benchmark output clean from warnings about missing projects
+    slnviz.logger.stream = sys.stderr
+
+    results = {
+        "python": platform.python_version(),
+        "runs": [],
+    }
+    for projects in args.projects:
+        parameters = {
+            "projects": projects,
+            "fanout": args.fanout,
+            "depth": args.depth,
+            "diamonds": args.diamonds,
+            "missing": args.missing,
+            "seed": args.seed,
+        }
+        results["runs"].append(run_benchmark(parameters, args.repeat, args.jobs, args.memory))
+
+    txt = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(txt)
+    else:
+        print(txt)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,17 +7,40 @@
 #
 
 from argparse import ArgumentParser
+from array import array
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 import re
 import os
 import xml.etree.ElementTree as ET
 import enum
+import hashlib
+import json
+import threading
+import time
+import io
+import sys
+import glob
+import fnmatch
+import uuid
+import cProfile
+import csv
+import heapq
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs
 
-debug_output = False
 solution_path = "."
 
-project_reference_declaration = re.compile("{(.*)}")
-project_declaration = re.compile("\s*Project\(\"{.*}\"\) = \"(.*)\", \"(.*)\", \"{(.*)}\"")
-project_dependency_declaration = re.compile("\s*{(.*)} = {(.*)}")
+project_reference_declaration = re.compile(r"{(.*)}")
+project_declaration = re.compile(r"\s*Project\(\"{.*}\"\) = \"(.*)\", \"(.*)\", \"{(.*)}\"")
+project_dependency_declaration = re.compile(r"\s*{(.*)} = {(.*)}")
+
+# project-files picked up when scanning a directory, and directories skipped
+project_file_extensions = (".csproj", ".vcxproj", ".fsproj")
+scan_ignore = [".git", ".vs", "bin", "obj", "node_modules"]
 
 # Available themes to select
 themes = {
@@ -41,6 +64,14 @@ themes = {
         'project.has_missing_projects.fillcolor': '#c2c230',
         'project.has_missing_projects.linecolor': '#000000',
         'project.has_missing_projects.fontcolor': '#000000',
+
+        'project.cycle.style': 'filled',
+        'project.cycle.fillcolor': '#e07b39',
+        'project.cycle.linecolor': '#000000',
+        'project.cycle.fontcolor': '#000000',
+
+        'diff.added.color': '#30c230',
+        'diff.removed.color': '#f22430',
     },
     'light': {
         'bgcolor': '#ffffff',
@@ -62,14 +93,19 @@ themes = {
         'project.has_missing_projects.fillcolor': '#c2c230',
         'project.has_missing_projects.linecolor': '#222222',
         'project.has_missing_projects.fontcolor': '#222222',
+
+        'project.cycle.style': 'filled',
+        'project.cycle.fillcolor': '#e07b39',
+        'project.cycle.linecolor': '#222222',
+        'project.cycle.fontcolor': '#222222',
+
+        'diff.added.color': '#30c230',
+        'diff.removed.color': '#f22430',
     }
 }
 
 # Apply default theme to the style attributes
-style_attributes = themes['dark']
-
-messages = []
-
+style_attributes = dict(themes['dark'])
 
 @enum.unique
 class MessageLevel(enum.Enum):
@@ -80,33 +116,180 @@ class MessageLevel(enum.Enum):
     ERROR = "ERROR  "
 
 
-class Message:
-    def __init__(self, level: MessageLevel, text: str):
-        self.level = level
-        self.text = text
-
-
-def __log_message(message: Message):
-    messages.append(message)
-    print('{0}: {1}'.format(message.level.value, message.text))
-
+message_severity = {
+    MessageLevel.DEBUG: 0,
+    MessageLevel.INFO: 1,
+    MessageLevel.WARNING: 2,
+    MessageLevel.ERROR: 3,
+}
 
-def log_info(text: str):
-    __log_message(Message(MessageLevel.INFO, text))
 
+class Message:
+    def __init__(self, level: MessageLevel, text: str, args: tuple = ()):
+        self.level = level
+        self.template = text
+        self.args = args
 
-def log_warning(text: str):
-    __log_message(Message(MessageLevel.WARNING, text))
+    @property
+    def text(self):
+        # formatted on first use only
+        if self.args:
+            self.template = self.template.format(*self.args)
+            self.args = ()
+        return self.template
 
 
-def log_error(text: str):
-    __log_message(Message(MessageLevel.ERROR, text))
+class Logger(object):
+    # Messages below the configured level are discarded before they are
+    # formatted, so that logging costs next to nothing when disabled.
+    #
+    # Emitted messages are kept in a bounded buffer, for writing to a log-file
+    # later, and console output is buffered and written in batches.
 
+    def __init__(self, level=MessageLevel.INFO, buffer_size=10000, flush_size=100, console=True):
+        self.severity = message_severity[level]
+        self.messages = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.console = console
+        self.stream = None
+        self.flush_size = flush_size
+        self.output = []
+        self.lock = threading.Lock()
+
+    def is_enabled(self, level: MessageLevel):
+        return message_severity[level] >= self.severity
+
+    def log(self, level: MessageLevel, text: str, args: tuple = ()):
+        if message_severity[level] < self.severity:
+            return
+
+        message = Message(level, text, args)
+        with self.lock:
+            if len(self.messages) == self.messages.maxlen:
+                self.dropped += 1
+            self.messages.append(message)
+            if self.console:
+                self.output.append(message)
+                if len(self.output) >= self.flush_size:
+                    self.__write_output()
+
+    def flush(self):
+        with self.lock:
+            self.__write_output()
+
+    def __write_output(self):
+        if self.output:
+            stream = self.stream if self.stream is not None else sys.stdout
+            stream.write("".join(['{0}: {1}\n'.format(msg.level.value, msg.text) for msg in self.output]))
+            stream.flush()
+            self.output = []
+
+    def write_logs(self, logfile: str, must_append: bool):
+        if logfile:
+            with open(logfile, "a" if must_append else "w") as log_file:
+                if self.dropped:
+                    log_file.write("{0}:{1} earlier messages were dropped\n".format(MessageLevel.WARNING.value, self.dropped))
+                log_file.writelines(["{0}:{1}\n".format(msg.level.value, msg.text) for msg in self.messages])
+
+
+# used when no analysis is running on the current thread
+logger = Logger()
+# library callers don't flush, so buffered console output is written on exit
+atexit.register(logger.flush)
+
+log_context = threading.local()
+
+
+def get_logger():
+    # the logger of the analysis running on the current thread
+    active = getattr(log_context, "logger", None)
+    return active if active is not None else logger
+
+
+@contextmanager
+def use_logger(active):
+    previous = getattr(log_context, "logger", None)
+    log_context.logger = active
+    try:
+        yield active
+    finally:
+        log_context.logger = previous
+
+
+def log_info(text: str, *args):
+    get_logger().log(MessageLevel.INFO, text, args)
+
+
+def log_warning(text: str, *args):
+    get_logger().log(MessageLevel.WARNING, text, args)
+
+
+def log_error(text: str, *args):
+    get_logger().log(MessageLevel.ERROR, text, args)
+
+
+def debug(text: str, *args):
+    get_logger().log(MessageLevel.DEBUG, text, args)
+
+
+class Profiler(object):
+    # Records wall- and CPU-time for every stage of processing, along with a
+    # set of counters, to tell where the time goes on slow runs.
+    # Stages marked as hot can additionally be profiled with cProfile.
+
+    def __init__(self, cprofile_file=None):
+        self.stages = OrderedDict()
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.cprofile_file = cprofile_file
+        self.cprofile = cProfile.Profile() if cprofile_file else None
+
+    @contextmanager
+    def stage(self, name, hot=False):
+        # cProfile can only follow a single thread
+        hot = hot and self.cprofile is not None and threading.current_thread() is threading.main_thread()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if hot:
+            self.cprofile.enable()
+        try:
+            yield
+        finally:
+            if hot:
+                self.cprofile.disable()
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            with self.lock:
+                # stages are accumulated, when processing several solutions
+                totals = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+                totals["wall"] += wall
+                totals["cpu"] += cpu
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_report(self):
+        return {
+            "stages": self.stages,
+            "counters": self.counters,
+        }
+
+    def log_summary(self):
+        for name, totals in self.stages.items():
+            log_info("Profile: {0}: {1:.3f}s wall, {2:.3f}s cpu", name, totals["wall"], totals["cpu"])
+        for name in sorted(self.counters):
+            log_info("Profile: {0}: {1}", name, self.counters[name])
+
+    def write_report(self, report_file):
+        if report_file:
+            with open(report_file, 'w') as f:
+                json.dump(self.get_report(), f, indent=2)
+            log_info("Wrote profile to '{0}'.", report_file)
 
-def debug(txt):
-    global debug_output
-    if debug_output:
-        __log_message(Message(MessageLevel.DEBUG, txt))
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(self.cprofile_file)
+            log_info("Wrote cProfile-stats to '{0}'.", self.cprofile_file)
 
 
 def get_unix_path(file):
@@ -121,86 +304,368 @@ def get_directory(file):
 def set_working_basedir(sln_file):
     global solution_path
     solution_path = get_directory(get_unix_path(sln_file))
-    debug("Base-solution dir set to {0}".format(solution_path))
+    debug("Base-solution dir set to {0}", solution_path)
+
+
+def read_project_file(xml_proj):
+    # streams through the project-file and only picks up its own ProjectGuid,
+    # and its <ProjectReference Include="path"><Project>{GUID}</Project>
+    # </ProjectReference>-elements. references are returned both as the
+    # GUIDs declared, and as [path, GUID or None] for every reference.
+    # elements are freed as soon as they have been read, so that large
+    # project-files are never held in memory in full.
+    guid = None
+    ids = []
+    references = []
+    root = None
+    depth = 0
+    reference_depth = 0
+    include = None
+    reference_id = None
+
+    for event, elem in ET.iterparse(xml_proj, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            if "ProjectReference" in elem.tag:
+                if reference_depth == 0:
+                    include = elem.get("Include")
+                    reference_id = None
+                reference_depth += 1
+            continue
+
+        depth -= 1
+        if reference_depth != 0:
+            if "Project" in elem.tag and elem.text:
+                match = project_reference_declaration.match(elem.text)
+                if match:
+                    ids.append(match.groups()[0].upper())
+                    if reference_id is None:
+                        reference_id = ids[-1]
+            if "ProjectReference" in elem.tag:
+                reference_depth -= 1
+                if reference_depth == 0 and include:
+                    references.append([include, reference_id])
+        elif guid is None and elem.tag.endswith("ProjectGuid") and elem.text:
+            match = project_reference_declaration.match(elem.text.strip())
+            guid = (match.groups()[0] if match else elem.text.strip()).upper()
+
+        elem.clear()
+        if depth == 1:
+            # detach completed top-level elements from the root too
+            root.clear()
+
+    return {
+        "guid": guid,
+        "ids": ids,
+        "references": references,
+    }
+
+
+def read_project_reference_ids(xml_proj):
+    # the GUIDs declared in <ProjectReference><Project>{GUID}</Project>
+    # </ProjectReference>
+    return read_project_file(xml_proj)["ids"]
+
+
+def get_file_hash(file):
+    digest = hashlib.sha1()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_project_info(entry):
+    # copies the parts of a cache-entry read from the project-file, so that
+    # callers can't modify the cache
+    return {
+        "guid": entry["guid"],
+        "ids": list(entry["ids"]),
+        "references": [list(reference) for reference in entry["references"]],
+    }
+
+
+class ProjectFileCache(object):
+    # Caches the project-references read from project-files, keyed by the
+    # absolute path of the file, and validated against its mtime and size,
+    # and optionally a hash of its contents. With hashes, project-files
+    # identical to one already read, such as the same project in another
+    # checkout, aren't parsed either.
+    #
+    # The cache can be persisted to disk, so that project-files which haven't
+    # changed are not parsed again on the next run.
+
+    version = 2
+
+    def __init__(self, cache_file=None, use_hash=False):
+        self.cache_file = cache_file
+        self.use_hash = use_hash
+        self.entries = {}
+        self.hashes = {}
+        self.used = set()
+        self.modified = False
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.files_parsed = 0
+        self.bytes_read = 0
+
+        if cache_file:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            debug("No usable cache found in '{0}'", self.cache_file)
+            return
+
+        if data.get("version") == self.version:
+            self.entries = data["entries"]
+            self.hashes = dict((entry["hash"], entry) for entry in self.entries.values() if entry["hash"])
+            debug("Loaded {0} cached project-files from '{1}'", len(self.entries), self.cache_file)
+
+    def is_current(self, entry, stat):
+        return entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+
+    def save(self):
+        if not self.cache_file:
+            return
+
+        with self.lock:
+            # evict entries for project-files which have changed or been
+            # removed since they were cached.
+            for path in list(self.entries):
+                if path not in self.used:
+                    try:
+                        is_stale = not self.is_current(self.entries[path], os.stat(path))
+                    except OSError:
+                        is_stale = True
+                    if is_stale:
+                        del self.entries[path]
+                        self.modified = True
+
+            if not self.modified:
+                return
+
+            temp_file = self.cache_file + ".tmp"
+            with open(temp_file, 'w') as f:
+                json.dump({"version": self.version, "entries": self.entries}, f)
+            os.replace(temp_file, self.cache_file)
+            self.modified = False
+        debug("Wrote {0} cached project-files to '{1}'", len(self.entries), self.cache_file)
+
+    def get_project_info(self, xml_proj):
+        # returns the GUID and references read from the project-file, as
+        # returned by read_project_file, or None if it doesn't exist.
+        path = os.path.abspath(xml_proj)
+        if not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            self.used.add(path)
+
+        if entry is not None and self.is_current(entry, stat):
+            with self.lock:
+                self.hits += 1
+            return get_project_info(entry)
+
+        digest = None
+        files_parsed = 0
+        bytes_read = 0
+        if self.use_hash:
+            digest = get_file_hash(path)
+            bytes_read += stat.st_size
+
+        with self.lock:
+            same = self.hashes.get(digest) if digest is not None else None
+
+        if same is not None:
+            # touched, but not changed, or the same as another project-file
+            info = get_project_info(same)
+        else:
+            info = read_project_file(path)
+            files_parsed += 1
+            bytes_read += stat.st_size
+
+        with self.lock:
+            self.hits += 1 - files_parsed
+            self.files_parsed += files_parsed
+            self.bytes_read += bytes_read
+            entry = {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "hash": digest,
+                "guid": info["guid"],
+                "ids": info["ids"],
+                "references": info["references"],
+            }
+            self.entries[path] = entry
+            if digest is not None:
+                self.hashes[digest] = entry
+            self.modified = True
+
+        return get_project_info(info)
+
+    def get_reference_ids(self, xml_proj):
+        # returns None if the project-file doesn't exist.
+        info = self.get_project_info(xml_proj)
+        if info is None:
+            return None
+        return info["ids"]
+
+    def get_statistics(self):
+        return {
+            "project_files_parsed": self.files_parsed,
+            "project_files_cached": self.hits,
+            "bytes_read": self.bytes_read,
+        }
 
 
 class Project(object):
-    def __init__(self, name, filename, id):
+    # graphs of 10k+ projects keep one instance per project alive, so the
+    # attributes are slotted, and GUIDs are interned to be stored only once
+    # however many projects reference them.
+    #
+    # once resolved into a ProjectGraph, a project's dependencies are only
+    # stored there, as integer arrays, and are listed from these when asked
+    # for. projects outside a graph keep their own lists.
+    __slots__ = (
+        "name",
+        "filename",
+        "id",
+        "solution_dir",
+        "graph",
+        "node",
+        "_dependant_ids",
+        "_dependant_projects",
+        "_declared_dependant_projects",
+        "has_missing_projects",
+        "is_missing_project",
+        "highlight",
+        "cycle",
+    )
+
+    def __init__(self, name, filename, id, solution_dir=None):
         self.name = name
         self.filename = filename
-        self.id = id
-        self.dependant_ids = []
-        self.dependant_projects = []
-        self.declared_dependant_projects = []
-        self.missing_project_ids = []
+        self.id = sys.intern(id)
+        self.solution_dir = solution_dir
+        self.graph = None
+        self.node = None
+        self._dependant_ids = None
+        self._dependant_projects = None
+        self._declared_dependant_projects = None
         self.has_missing_projects = False
         self.is_missing_project = False
         self.highlight = False
+        self.cycle = None
+
+    @property
+    def dependant_ids(self):
+        # in declaration order, or in the order of the graph once resolved
+        if self._dependant_ids is not None:
+            return self._dependant_ids
+        if self.graph is not None:
+            return [self.graph.projects[dep].id for dep in self.graph.declared_dependencies[self.node]]
+        return []
+
+    @dependant_ids.setter
+    def dependant_ids(self, ids):
+        self._dependant_ids = ids
+
+    @property
+    def dependant_projects(self):
+        if self._dependant_projects is not None:
+            return self._dependant_projects
+        if self.graph is not None:
+            return self.graph.get_projects(self.graph.dependencies[self.node])
+        return []
+
+    @dependant_projects.setter
+    def dependant_projects(self, projects):
+        self._dependant_projects = projects
+
+    @property
+    def declared_dependant_projects(self):
+        if self._declared_dependant_projects is not None:
+            return self._declared_dependant_projects
+        if self.graph is not None:
+            return self.graph.get_projects(self.graph.declared_dependencies[self.node])
+        return []
+
+    @declared_dependant_projects.setter
+    def declared_dependant_projects(self, projects):
+        self._declared_dependant_projects = projects
+
+    @property
+    def missing_project_ids(self):
+        return [dep.id for dep in self.declared_dependant_projects if dep.is_missing_project]
 
     def filter_id(self, id):
         return id.replace("-", "")
 
     def get_friendly_id(self):
-        return self.name.replace(".", "_").replace("-", "_")
+        return get_friendly_id(self.name)
 
     def add_dependency(self, id):
-        id = str.upper(id)
-        if id not in self.dependant_ids:
-            self.dependant_ids.append(id)
+        id = sys.intern(str.upper(id))
+        if self._dependant_ids is None:
+            self._dependant_ids = []
+        if id not in self._dependant_ids:
+            self._dependant_ids.append(id)
 
     def get_full_project_file_path(self):
-        return os.path.join(solution_path, get_unix_path(self.filename))
+        solution_dir = self.solution_dir if self.solution_dir is not None else solution_path
+        return os.path.join(solution_dir, get_unix_path(self.filename))
 
-    def get_project_references(self, xml_doc):
-        nodes = []
-        for elem in xml_doc.getiterator():
-            if "ProjectReference" in elem.tag:
-                nodes.append(elem)
-        return nodes
-
-    def get_project_ids(self, nodes):
-        result = []
-        for node in nodes:
-            for elem in node.getiterator():
-                if "Project" in elem.tag and elem.text:
-                    match = project_reference_declaration.match(elem.text)
-                    if match:
-                        result.append(match.groups()[0].upper())
-        return result
-
-    def get_declared_project_dependency_ids(self):
+    def read_declared_project_dependency_ids(self, cache=None):
+        # doesn't log, so it can safely be called from worker-threads.
+        # returns None if the project-file doesn't exist.
         xml_proj = self.get_full_project_file_path()
+        if cache is not None:
+            return cache.get_reference_ids(xml_proj)
+
         if not os.path.isfile(xml_proj):
-            log_warning("--Project {0}-- Couldn't open project-file '{1}'".format(self.name, xml_proj))
-            return []
+            return None
 
-        xml_doc = ET.parse(xml_proj).getroot()
-        nodes = self.get_project_references(xml_doc)
-        ids = self.get_project_ids(nodes)
+        return read_project_reference_ids(xml_proj)
+
+    def log_missing_project_file(self):
+        log_warning("--Project {0}-- Couldn't open project-file '{1}'", self.name, self.get_full_project_file_path())
+
+    def get_declared_project_dependency_ids(self, cache=None):
+        ids = self.read_declared_project_dependency_ids(cache)
+        if ids is None:
+            self.log_missing_project_file()
+            return []
         return ids
 
-    def apply_declared_project_dependencies(self):
-        ids = self.get_declared_project_dependency_ids()
+    def apply_declared_project_dependencies(self, ids=None):
+        if ids is None:
+            ids = self.get_declared_project_dependency_ids()
         for id in ids:
             self.add_dependency(id)
 
     def resolve_projects_from_ids(self, projects):
+        dependant_projects = []
         for id in self.dependant_ids:
             project = get_project_by_id(id, projects)
             if project is None:
-                # track missing deps consistently
-                missing_project_id = "Missing_" + id.replace("-", "")
-                project = Project(missing_project_id, missing_project_id, id)
-                project.is_missing_project = True
+                project = create_missing_project(id)
                 projects.append(project)
 
             if project.is_missing_project:
                 self.has_missing_projects = True
-                self.missing_project_ids.append(id)
 
-            self.dependant_projects.append(project)
+            dependant_projects.append(project)
 
-        self.declared_dependant_projects = self.dependant_projects
+        self.dependant_projects = dependant_projects
+        self.declared_dependant_projects = dependant_projects
 
     def remove_transitive_dependencies(self):
         # if A depends on B & C, and
@@ -208,39 +673,34 @@ class Project(object):
         # A has a transitive dependency on C through B.
 
         # This is a dependency which can be eliminated to clean up the graph.
-
-        # clone list to have separate object to work on
-        project_deps = self.dependant_projects[:]
-
-        # investigate each direct sub-dependency as its own tree
-        for dep in self.dependant_projects:
-
-            # calculate all dependencies for this one tree
-            nested_deps = dep.get_nested_dependencies()
-
-            # check if any of those are direct dependencues
-            for nested_dep in nested_deps:
-                # if so, remove them
-                if nested_dep in project_deps:
-                    debug("--Project {0}-- Removed transitive dependency: {1} (via {2})".format(self.name, nested_dep.name, dep.name))
-                    project_deps.remove(nested_dep)
-
-        eliminated_deps = len(self.dependant_projects) - len(project_deps)
-        if eliminated_deps != 0:
-            debug("--Project {0}-- Eliminated {1} transitive dependencies. Was {2}. Reduced to {3}".format(self.name, eliminated_deps, len(self.dependant_projects), len(project_deps)))
-
-        self.dependant_projects = project_deps
+        remove_transitive_dependencies([self])
 
     def get_nested_dependencies(self):
-        # clone to new list, don't modify the existing list!
-        # that means -adding- dependencies when we want to remove them!
-        total_deps = self.dependant_projects[:]
-
-        for dep in self.dependant_projects:
-            dep_deps = dep.get_nested_dependencies()
-            for dep_dep in dep_deps:
-                if dep_dep not in total_deps:
-                    total_deps.append(dep_dep)
+        # every project is expanded only once, and without recursion, so that
+        # reference-cycles and deep chains are safe. the order is the same as
+        # when listing the direct dependencies of every project, followed by
+        # their nested dependencies.
+        total_deps = []
+        seen = set()
+        expanded = set([self])
+
+        def add(deps):
+            for dep in deps:
+                if dep not in seen:
+                    seen.add(dep)
+                    total_deps.append(dep)
+
+        add(self.dependant_projects)
+        stack = [iter(self.dependant_projects)]
+        while stack:
+            for dep in stack[-1]:
+                if dep not in expanded:
+                    expanded.add(dep)
+                    add(dep.dependant_projects)
+                    stack.append(iter(dep.dependant_projects))
+                    break
+            else:
+                stack.pop()
 
         return total_deps
 
@@ -260,7 +720,283 @@ class Project(object):
         
 
 
+def get_friendly_id(name):
+    return name.replace(".", "_").replace("-", "_")
+
+
+def create_missing_project(id):
+    # track missing deps consistently
+    missing_project_id = "Missing_" + id.replace("-", "")
+    project = Project(missing_project_id, missing_project_id, id)
+    project.is_missing_project = True
+    return project
+
+
+class ProjectGraph(object):
+    # All projects in a solution, interned to dense integer node-ids.
+    #
+    # Dependencies are stored as compact integer arrays, both as declared and
+    # as they remain after transitive reduction, and project GUIDs are looked
+    # up through a dict-index. Iterating the graph yields the projects in
+    # alphabetical order, so it can be used where a list of projects is expected.
+
+    def __init__(self):
+        self.projects = []
+        self.index = {}
+        self.nodes = {}
+        self.declared_dependencies = []
+        self.dependencies = []
+        self.order = []
+        self.closure = None
+        self.cycles = []
+        # bitset of the members of its cycle, for every node in a cycle
+        self.cycle_members = {}
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return (self.projects[node] for node in self.order)
+
+    def __getitem__(self, position):
+        return self.projects[self.order[position]]
+
+    def add_project(self, project):
+        node = len(self.projects)
+        self.projects.append(project)
+        self.nodes[project] = node
+        # on duplicate GUIDs, the first declared project wins
+        self.index.setdefault(project.id, node)
+        self.declared_dependencies.append(array('i'))
+        self.dependencies.append(self.declared_dependencies[node])
+        self.order.append(node)
+        return node
+
+    # allows the graph to be used by Project.resolve_projects_from_ids
+    append = add_project
+
+    def get_node(self, id):
+        return self.index.get(id)
+
+    def get_project(self, id):
+        node = self.index.get(id)
+        if node is None:
+            return None
+        return self.projects[node]
+
+    def get_projects(self, nodes):
+        projects = self.projects
+        return [projects[node] for node in nodes]
+
+    @staticmethod
+    def from_projects(projects):
+        # builds a graph from already resolved projects, and all projects
+        # reachable from them, without modifying any of them.
+        graph = ProjectGraph()
+        pending = list(projects)
+        while pending:
+            project = pending.pop()
+            if project not in graph.nodes:
+                graph.add_project(project)
+                pending.extend(project.dependant_projects)
+
+        for node, project in enumerate(graph.projects):
+            deps = array('i', [graph.nodes[dep] for dep in project.dependant_projects])
+            graph.declared_dependencies[node] = deps
+            graph.dependencies[node] = deps
+
+        return graph
+
+    def resolve(self):
+        # all projects & dependencies should now be known. lets analyze them.
+        # missing projects are added to the graph while resolving, but have
+        # no dependencies of their own to resolve.
+        for node in range(len(self.projects)):
+            self.resolve_node(node)
+
+        self.sort()
+
+    def resolve_node(self, node):
+        # from here on, the dependencies of the project are only stored in
+        # the graph.
+        project = self.projects[node]
+        deps = array('i')
+        for id in project.dependant_ids:
+            dep = self.index.get(id)
+            if dep is None:
+                dep = self.add_project(create_missing_project(id))
+
+            if self.projects[dep].is_missing_project:
+                project.has_missing_projects = True
+
+            deps.append(dep)
+
+        self.declared_dependencies[node] = deps
+        self.dependencies[node] = deps
+        project.graph = self
+        project.node = node
+        project.dependant_ids = None
+        project.dependant_projects = None
+        project.declared_dependant_projects = None
+
+    def get_rank(self):
+        # position of every node, in alphabetical order
+        rank = [0] * len(self.projects)
+        for position, node in enumerate(self.order):
+            rank[node] = position
+        return rank
+
+    def sort(self, nodes=None):
+        # format results in a alphabetical order
+        projects = self.projects
+        self.order.sort(key=lambda node: projects[node].name)
+        rank = self.get_rank()
+
+        if nodes is None:
+            nodes = range(len(projects))
+
+        for node in nodes:
+            deps = array('i', sorted(self.declared_dependencies[node], key=rank.__getitem__))
+            self.declared_dependencies[node] = deps
+            self.dependencies[node] = deps
+
+    def get_dependants(self):
+        # reverse adjacency of the declared dependencies
+        dependants = [[] for project in self.projects]
+        for node, deps in enumerate(self.declared_dependencies):
+            for dep in deps:
+                dependants[dep].append(node)
+        return dependants
+
+    def get_dependant_closure(self, nodes):
+        # the given nodes, and all nodes depending on them
+        dependants = self.get_dependants()
+        result = set(nodes)
+        pending = list(nodes)
+        while pending:
+            for dependant in dependants[pending.pop()]:
+                if dependant not in result:
+                    result.add(dependant)
+                    pending.append(dependant)
+        return result
+
+    def update_dependency_ids(self, node, ids):
+        # replaces the dependencies of a single project, without resolving
+        # the rest of the graph again.
+        project = self.projects[node]
+        project.dependant_ids = []
+        project.has_missing_projects = False
+        for id in ids:
+            project.add_dependency(id)
+
+        self.resolve_node(node)
+        self.sort([node])
+
+    def find_cycles(self):
+        # marks every project in a reference-cycle with the number of its
+        # cycle, and returns the cycles as lists of nodes.
+        adjacency = self.declared_dependencies
+        self.cycles = [component for component in get_strongly_connected_components(adjacency)
+                       if len(component) > 1 or component[0] in adjacency[component[0]]]
+        self.cycle_members = {}
+
+        for project in self.projects:
+            project.cycle = None
+
+        for number, cycle in enumerate(self.cycles):
+            members = 0
+            for node in cycle:
+                members |= 1 << node
+            for node in cycle:
+                self.projects[node].cycle = number
+                self.cycle_members[node] = members
+
+        return self.cycles
+
+    def remove_transitive_dependencies(self, nodes=None):
+        if nodes is None:
+            nodes = range(len(self.projects))
+
+        self.find_cycles()
+        self.closure = get_transitive_closure(self.declared_dependencies)
+        self.reduce_dependencies(nodes)
+
+    def remove_all_transitive_dependencies(self):
+        # every node is reduced as soon as its closure is known. the closure
+        # of a node is only needed until all nodes depending on it are
+        # reduced, so it's released as it goes, instead of all of it being
+        # held at once. it's computed again if the graph is updated.
+        # returns the number of dependencies merged into a closure.
+        adjacency = self.declared_dependencies
+        pending = [0] * len(adjacency)
+        for deps in adjacency:
+            for dep in deps:
+                pending[dep] += 1
+
+        self.find_cycles()
+        self.closure = [0] * len(adjacency)
+        merged = 0
+        for component, component_merged in iter_transitive_closure(adjacency, self.closure):
+            merged += component_merged
+            self.reduce_dependencies(component)
+            for node in component:
+                if not pending[node]:
+                    self.closure[node] = 0
+                for dep in adjacency[node]:
+                    pending[dep] -= 1
+                    if not pending[dep]:
+                        self.closure[dep] = 0
+
+        self.closure = None
+        return merged
+
+    def update_transitive_dependencies(self, nodes):
+        # when the dependencies of some projects change, only they, and the
+        # projects depending on them, need their closure and reduction updated.
+        affected = self.get_dependant_closure(nodes)
+        self.find_cycles()
+        if self.closure is None:
+            self.closure = get_transitive_closure(self.declared_dependencies)
+        else:
+            self.closure.extend([0] * (len(self.projects) - len(self.closure)))
+            get_transitive_closure(self.declared_dependencies, self.closure, affected)
+        self.reduce_dependencies(sorted(affected))
+
+    def reduce_dependencies(self, nodes):
+        adjacency = self.declared_dependencies
+        closure = self.closure
+
+        for node in nodes:
+            project = self.projects[node]
+            cycle = self.cycle_members.get(node, 0)
+            deps = array('i', get_reduced_dependencies(adjacency[node], closure, cycle, self.cycle_members))
+
+            eliminated_deps = len(adjacency[node]) - len(deps)
+            if eliminated_deps != 0 and get_logger().is_enabled(MessageLevel.DEBUG):
+                remaining = set(deps)
+                for dep in adjacency[node]:
+                    if cycle & (1 << dep):
+                        continue
+                    reachable = closure[dep] | self.cycle_members.get(dep, 0)
+                    for nested_dep in adjacency[node]:
+                        if nested_dep not in remaining and nested_dep != dep and reachable & (1 << nested_dep):
+                            debug("--Project {0}-- Removed transitive dependency: {1} (via {2})", project.name, self.projects[nested_dep].name, self.projects[dep].name)
+                            remaining.add(nested_dep)
+
+                debug("--Project {0}-- Eliminated {1} transitive dependencies. Was {2}. Reduced to {3}", project.name, eliminated_deps, len(adjacency[node]), len(deps))
+
+            # when nothing is eliminated, the reduced dependencies share the
+            # storage of the declared ones.
+            self.dependencies[node] = deps if eliminated_deps else adjacency[node]
+            # projects not resolved into this graph keep lists of their own
+            if project.graph is not self:
+                project.dependant_projects = self.get_projects(self.dependencies[node])
+
+
 def get_project_by_id(id, projects):
+    if isinstance(projects, ProjectGraph):
+        return projects.get_project(id)
+
     for project in projects:
         if project.id == id:
             return project
@@ -268,58 +1004,737 @@ def get_project_by_id(id, projects):
 
 
 def get_lines_from_file(file):
+    # streams the file line by line, instead of reading it all into memory
     with open(file, 'r') as f:
-        contents = f.read()
-        lines = contents.split("\n")
-        return lines
+        for line in f:
+            yield line.rstrip("\n")
 
 
 def sort_projects(projects):
     projects.sort(key=lambda x: x.name)
 
 
-def analyze_projects_in_solution(lines):
+def apply_declared_project_dependencies(projects, jobs=1, cache=None):
+    # project-files may be parsed on a pool of worker-threads, but results
+    # are applied and warnings logged in declaration order, so that output
+    # is the same regardless of the number of jobs.
+    def read(project):
+        return project.read_declared_project_dependency_ids(cache)
+
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            apply_declared_project_dependency_ids(projects, executor.map(read, projects))
+    else:
+        apply_declared_project_dependency_ids(projects, map(read, projects))
+
+
+def apply_declared_project_dependency_ids(projects, results):
+    for project, ids in zip(projects, results):
+        if ids is None:
+            project.log_missing_project_file()
+        else:
+            project.apply_declared_project_dependencies(ids)
+
+
+def parse_solution_projects(lines, solution_dir=None):
+    # single pass over the solution, which only runs the regexes on lines
+    # which can actually match. dependencies are only picked up inside
+    # ProjectSection(ProjectDependencies), and scanning stops at the
+    # Global-section, which holds nothing but build-configuration.
 
     projects = []
     current_project = None
+    in_dependencies = False
 
     for line in lines:
+        stripped = line.lstrip()
+
+        if in_dependencies:
+            if stripped.startswith("{"):
+                m = project_dependency_declaration.match(line)
+                if m is not None:
+                    [id1, id2] = m.groups()
+                    # sanity-check: should be same value!
+                    if id1 == id2:
+                        current_project.add_dependency(id1)
+            elif stripped.startswith("EndProjectSection"):
+                in_dependencies = False
+
+        elif stripped.startswith("Project("):
+            current_project = None
+            m = project_declaration.match(line)
+            if m is not None:
+                [name, filename, id] = m.groups()
+                # solution folders are declared with a virtual filename, same as
+                # node-name. ignore these entries!
+                if name != filename:
+                    current_project = Project(name, filename, id, solution_dir)
+                    projects.append(current_project)
+
+        elif stripped.startswith("ProjectSection(ProjectDependencies)"):
+            in_dependencies = current_project is not None
+
+        elif stripped.startswith("Global") and stripped.rstrip() == "Global":
+            break
 
-        m = project_declaration.match(line)
-        if m is not None:
-            [name, filename, id] = m.groups()
-            # solution folders are declared with a virtual filename, same as
-            # node-name. ignore these entries!
-            if name != filename:
-                current_project = Project(name, filename, id)
-                projects.append(current_project)
-
-        m = project_dependency_declaration.match(line)
-        if m is not None:
-            [id1, id2] = m.groups()
-            # sanity-check: should be same value!
-            if id1 == id2:
-                current_project.add_dependency(id1)
+    return projects
 
-    # pull in dependencies declared in project-files
-    for project in projects:
-        project.apply_declared_project_dependencies()
 
-    # all projects & dependencies should now be known. lets analyze them
+def expand_reachable_projects(projects, start, depth=None, jobs=1, cache=None):
+    # starts from the given projects, and follows their dependencies level
+    # by level, so that only project-files of projects actually reached are
+    # read. projects on the last level are included, but not expanded.
+    index = {}
+    position = {}
+    for i, project in enumerate(projects):
+        index.setdefault(project.id, project)
+        position[project] = i
+
+    level = list(start)
+    reached = set(level)
+    distance = 0
+
+    while level:
+        if depth is not None and distance >= depth:
+            for project in level:
+                project.dependant_ids = []
+            break
+
+        apply_declared_project_dependencies(level, jobs, cache)
+
+        next_level = []
+        for project in level:
+            for id in project.dependant_ids:
+                dep = index.get(id)
+                if dep is not None and dep not in reached:
+                    reached.add(dep)
+                    next_level.append(dep)
+
+        # in declaration order, to log warnings in the same order every time
+        level = sorted(next_level, key=lambda project: position[project])
+        distance += 1
+
+    return [project for project in projects if project in reached]
+
+
+def expand_focused_projects(projects, rx, depth=None, jobs=1, cache=None):
+    # the projects matching rx, and the projects they depend on
+    start = [project for project in projects if rx.match(str.lower(project.name))]
+    reached = expand_reachable_projects(projects, start, depth, jobs, cache)
+    debug("Focused on {0} of {1} projects", len(reached), len(projects))
+    return reached
+
+
+def skip_excluded_projects(projects, rx, jobs=1, cache=None):
+    # leaves out projects matching rx, without reading their project-files,
+    # unless other projects depend on them. those are kept along with their
+    # dependencies, so that transitive dependencies through them are still
+    # removed from the projects which remain.
+    start = [project for project in projects if not rx.match(str.lower(project.name))]
+    reached = expand_reachable_projects(projects, start, None, jobs, cache)
+    debug("Skipped {0} excluded projects", len(projects) - len(reached))
+    return reached
+
+
+def create_project_graph(projects):
+    graph = ProjectGraph()
     for project in projects:
-        project.resolve_projects_from_ids(projects)
+        graph.add_project(project)
 
-    # format results in a alphabetical order
-    sort_projects(projects)
-    for project in projects:
-        sort_projects(project.dependant_projects)
+    graph.resolve()
+
+    return graph
+
+
+def analyze_projects_in_solution(lines, jobs=1, cache=None, solution_dir=None):
+    projects = parse_solution_projects(lines, solution_dir)
+
+    # pull in dependencies declared in project-files
+    apply_declared_project_dependencies(projects, jobs, cache)
+
+    return create_project_graph(projects)
+
+
+def is_ignored_directory(name, ignore):
+    for pattern in ignore:
+        if fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+
+def scan_directory(directory, ignore):
+    # returns the sub-directories to scan next, and the project-files found
+    # in a single directory. doesn't log, so it can safely be called from
+    # worker-threads, but returns the error if the directory can't be read.
+    directories = []
+    files = []
+    try:
+        for entry in os.scandir(directory):
+            if entry.is_dir(follow_symlinks=False):
+                if not is_ignored_directory(entry.name, ignore):
+                    directories.append(entry.path)
+            elif entry.name.lower().endswith(project_file_extensions):
+                files.append(entry.path)
+    except OSError as e:
+        return directories, files, e
+
+    return directories, files, None
+
+
+def find_project_files(root, jobs=1, ignore=None):
+    # walks the directory-tree breadth first, and lists every directory of a
+    # level in parallel. symlinked directories are not followed, so that
+    # the walk always ends.
+    if ignore is None:
+        ignore = scan_ignore
+
+    def scan(directory):
+        return scan_directory(directory, ignore)
+
+    result = []
+    level = [root]
+    directories = 0
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        while level:
+            directories += len(level)
+            next_level = []
+            for directory, (subdirectories, files, error) in zip(level, executor.map(scan, level)):
+                if error is not None:
+                    log_warning("Couldn't scan directory '{0}': {1}", directory, error)
+                next_level.extend(subdirectories)
+                result.extend(files)
+            level = next_level
+
+    debug("Found {0} project-files in {1} directories", len(result), directories)
+    return sorted(result)
+
+
+def get_scanned_project_id(path):
+    # projects without a ProjectGuid get a stable GUID derived from their path
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, get_unix_path(path).lower())).upper()
+
+
+def get_path_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def scan_projects(root, jobs=1, cache=None, ignore=None):
+    # creates a project for every project-file found below root, with its
+    # dependencies resolved from the references of the project-files.
+    # references are matched by path first, so that they work without
+    # GUIDs too, and by GUID otherwise.
+    files = find_project_files(root, jobs, ignore)
+
+    def read(xml_proj):
+        if cache is not None:
+            return cache.get_project_info(xml_proj)
+        return read_project_file(xml_proj)
+
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            infos = list(executor.map(read, files))
+    else:
+        infos = list(map(read, files))
+
+    # project-files removed while scanning are skipped
+    found = [(xml_proj, info) for xml_proj, info in zip(files, infos) if info is not None]
+    files = [xml_proj for xml_proj, info in found]
+    infos = [info for xml_proj, info in found]
+
+    names = [os.path.splitext(os.path.basename(xml_proj))[0] for xml_proj in files]
+    counts = {}
+    for name in names:
+        counts[name] = counts.get(name, 0) + 1
+
+    projects = []
+    paths = {}
+    owners = {}
+    for xml_proj, name, info in zip(files, names, infos):
+        filename = os.path.relpath(xml_proj, root)
+        if counts[name] > 1:
+            # tell projects with the same name apart by their directory
+            name = os.path.splitext(get_unix_path(filename))[0].replace("/", ".")
+
+        id = info["guid"]
+        if id is None or id in owners:
+            if id is not None:
+                log_warning("--Project {0}-- Same ProjectGuid as '{1}'. Using an id based on its path instead.", name, owners[id])
+            id = get_scanned_project_id(filename)
+
+        owners[id] = filename
+        project = Project(name, filename, id, root)
+        projects.append(project)
+        paths[get_path_key(xml_proj)] = project
+
+    for project, xml_proj, info in zip(projects, files, infos):
+        project_dir = os.path.dirname(xml_proj)
+        for include, id in info["references"]:
+            path = os.path.join(project_dir, get_unix_path(include))
+            dep = paths.get(get_path_key(path))
+            if dep is not None:
+                project.add_dependency(dep.id)
+            elif id is not None:
+                project.add_dependency(id)
+            else:
+                log_warning("--Project {0}-- Referenced project-file not found: '{1}'", project.name, include)
+                project.add_dependency(get_scanned_project_id(os.path.relpath(path, root)))
 
     return projects
 
 
+def get_strongly_connected_components(adjacency):
+    # Tarjan's algorithm, iterative to not hit the recursion-limit on deep
+    # graphs. components are returned dependencies first, so that the list
+    # doubles as a topological order of the graph, with every reference-cycle
+    # condensed into a single component.
+    count = len(adjacency)
+    index = [-1] * count
+    lowlink = [0] * count
+    on_stack = [False] * count
+    stack = []
+    components = []
+    next_index = 0
+
+    for root in range(count):
+        if index[root] != -1:
+            continue
+
+        index[root] = lowlink[root] = next_index
+        next_index += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, iter(adjacency[root]))]
+
+        while work:
+            node, deps = work[-1]
+            for dep in deps:
+                if index[dep] == -1:
+                    index[dep] = lowlink[dep] = next_index
+                    next_index += 1
+                    stack.append(dep)
+                    on_stack[dep] = True
+                    work.append((dep, iter(adjacency[dep])))
+                    break
+                elif on_stack[dep]:
+                    lowlink[node] = min(lowlink[node], index[dep])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+    return components
+
+
+def get_transitive_closure(adjacency, closure=None, nodes=None):
+    # closure[node] is a bitset of all nodes reachable from node, outside of
+    # its own reference-cycle. computed once per strongly connected
+    # component, dependencies first, so every node is only visited once.
+    # if nodes are given, only their part of an existing closure is updated.
+    if closure is None:
+        closure = [0] * len(adjacency)
+
+    for component, merged in iter_transitive_closure(adjacency, closure, nodes):
+        pass
+
+    return closure
+
+
+def iter_transitive_closure(adjacency, closure, nodes=None):
+    # yields every component as soon as its closure is known, so callers can
+    # use it before the closure of the whole graph is done, along with the
+    # number of dependencies merged into its closure. dependencies within a
+    # reference-cycle are not merged.
+    components = get_strongly_connected_components(adjacency)
+    component_of = [0] * len(adjacency)
+    members = {}
+    for number, component in enumerate(components):
+        for node in component:
+            component_of[node] = number
+        if len(component) > 1:
+            members[number] = sum(1 << node for node in component)
+
+    for number, component in enumerate(components):
+        if nodes is not None and component[0] not in nodes:
+            continue
+
+        reachable = 0
+        merged = 0
+        for node in component:
+            for dep in adjacency[node]:
+                dep_component = component_of[dep]
+                if dep_component != number:
+                    reachable |= closure[dep] | members.get(dep_component, 1 << dep)
+                    merged += 1
+
+        for node in component:
+            closure[node] = reachable
+
+        yield component, merged
+
+
+def get_reduced_dependencies(deps, closure, cycle=0, cycle_members=None):
+    # a direct dependency is redundant if it can be reached through
+    # any of the other direct dependencies. dependencies within the node's
+    # own reference-cycle, given as a bitset, are always kept, while of
+    # several dependencies into another cycle only the first is kept.
+    indirect = 0
+    for dep in deps:
+        if not cycle & (1 << dep):
+            indirect |= closure[dep]
+
+    result = []
+    for dep in deps:
+        if cycle & (1 << dep):
+            result.append(dep)
+        elif not indirect & (1 << dep):
+            result.append(dep)
+            if cycle_members:
+                indirect |= cycle_members.get(dep, 0)
+
+    return result
+
+
+def get_transitive_reduction(adjacency, closure):
+    return [get_reduced_dependencies(deps, closure) for deps in adjacency]
+
+
 def remove_transitive_dependencies(projects):
-    for project in projects:
-        project.remove_transitive_dependencies()
+    if isinstance(projects, ProjectGraph):
+        projects.remove_all_transitive_dependencies()
+        return
+
+    graph = ProjectGraph.from_projects(projects)
+    graph.remove_transitive_dependencies([graph.nodes[project] for project in projects])
+
+
+class ImpactIndex(object):
+    # Answers which projects are affected by changes to a set of files.
+    #
+    # Files are mapped to the project owning the closest directory above
+    # them, through an index of project-directories, and affected projects
+    # are all projects depending on the owners, directly or transitively,
+    # found through an index of reverse dependencies. The index is built
+    # once per graph, after which every query only visits the directories
+    # of the changed files and the projects affected.
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.rank = graph.get_rank()
+        self.dependants = graph.get_dependants()
+        self.owners = {}
+        for node, project in enumerate(graph.projects):
+            if not project.is_missing_project:
+                directory = os.path.dirname(get_path_key(project.get_full_project_file_path()))
+                self.owners.setdefault(directory, []).append(node)
+
+    def get_owners(self, path, base="."):
+        # the nodes of the projects in the closest directory above path
+        directory = get_path_key(os.path.join(base, get_unix_path(path)))
+        while True:
+            nodes = self.owners.get(directory)
+            if nodes is not None:
+                return nodes
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return []
+            directory = parent
+
+    def get_affected(self, paths, base="."):
+        # the projects owning any of the paths, and all projects depending
+        # on them, in alphabetical order. relative paths are relative to base.
+        affected = set()
+        pending = []
+        for path in paths:
+            nodes = self.get_owners(path, base)
+            if not nodes:
+                debug("No project owns '{0}'", path)
+            for node in nodes:
+                if node not in affected:
+                    affected.add(node)
+                    pending.append(node)
+
+        while pending:
+            for dependant in self.dependants[pending.pop()]:
+                if dependant not in affected:
+                    affected.add(dependant)
+                    pending.append(dependant)
+
+        return [self.graph.projects[node] for node in sorted(affected, key=self.rank.__getitem__)]
+
+
+def read_build_weights(csv_file):
+    # reads "project,weight" rows, such as measured build-times in seconds.
+    # rows without a numeric weight, like a header, are skipped.
+    weights = {}
+    with open(csv_file, 'r', newline='') as f:
+        for row in csv.reader(f):
+            if len(row) < 2:
+                continue
+            try:
+                weights[row[0].strip()] = float(row[1])
+            except ValueError:
+                continue
+    return weights
+
+
+def get_build_weights(graph, weights=None):
+    # the weight of every node: 1 per project by default, the size of the
+    # project-file with "size", or the weights given per project-name.
+    # projects without a given weight get the mean of the others.
+    result = [0.0] * len(graph.projects)
+    unweighted = []
+    for node, project in enumerate(graph.projects):
+        if project.is_missing_project:
+            continue
+        if weights is None:
+            result[node] = 1.0
+        elif weights == "size":
+            try:
+                result[node] = float(os.path.getsize(project.get_full_project_file_path()))
+            except OSError:
+                unweighted.append(node)
+        elif project.name in weights:
+            result[node] = weights[project.name]
+        else:
+            unweighted.append(node)
+
+    if unweighted:
+        skipped = set(unweighted)
+        known = [result[node] for node, project in enumerate(graph.projects)
+                 if not project.is_missing_project and node not in skipped]
+        mean = sum(known) / len(known) if known else 1.0
+        log_warning("No build-weight for {0} projects. Using the mean weight of {1:.2f}.", len(unweighted), mean)
+        for node in unweighted:
+            result[node] = mean
+
+    return result
+
+
+def get_build_schedule(graph, weights=None, build_jobs=None):
+    # topological levels, the critical path and a parallel build-schedule
+    # for the graph. projects in a reference-cycle can't be built apart, so
+    # every cycle is scheduled as one unit, which takes as long as all its
+    # projects together.
+    #
+    # without build_jobs every unit starts as soon as its dependencies are
+    # built. with build_jobs, units are scheduled on that many workers,
+    # picking the unit with the longest chain of dependants left first.
+    projects = graph.projects
+    adjacency = graph.declared_dependencies
+    node_weights = get_build_weights(graph, weights)
+
+    # units in topological order, dependencies first
+    units = [[node for node in component if not projects[node].is_missing_project]
+             for component in get_strongly_connected_components(adjacency)]
+    units = [sorted(unit, key=lambda node: projects[node].name) for unit in units if unit]
+    unit_of = {}
+    for number, unit in enumerate(units):
+        for node in unit:
+            unit_of[node] = number
+
+    deps = []
+    dependants = [[] for unit in units]
+    for number, unit in enumerate(units):
+        unit_deps = set(unit_of[dep] for node in unit for dep in adjacency[node] if dep in unit_of)
+        unit_deps.discard(number)
+        deps.append(sorted(unit_deps))
+        for dep in unit_deps:
+            dependants[dep].append(number)
+
+    weight = [sum(node_weights[node] for node in unit) for unit in units]
+    level = [0] * len(units)
+    finish = [0.0] * len(units)
+    previous = [None] * len(units)
+    for number in range(len(units)):
+        for dep in deps[number]:
+            level[number] = max(level[number], level[dep])
+            if previous[number] is None or finish[dep] > finish[previous[number]]:
+                previous[number] = dep
+        level[number] += 1
+        start = finish[previous[number]] if previous[number] is not None else 0.0
+        finish[number] = start + weight[number]
+
+    # the critical path ends with the unit finishing last
+    critical_path = []
+    last = max(range(len(units)), key=lambda number: finish[number], default=None)
+    while last is not None:
+        critical_path.append(last)
+        last = previous[last]
+    critical_path.reverse()
+
+    if build_jobs:
+        start, worker = get_list_schedule(weight, deps, dependants, build_jobs,
+                                          [projects[unit[0]].name for unit in units])
+        finish = [start[number] + weight[number] for number in range(len(units))]
+    else:
+        start = [finish[number] - weight[number] for number in range(len(units))]
+        worker = None
+
+    levels = [[] for i in range(max(level, default=0))]
+    for number, unit in enumerate(units):
+        levels[level[number] - 1].extend(projects[node].name for node in unit)
+
+    schedule = []
+    for number in sorted(range(len(units)), key=lambda number: (start[number], projects[units[number][0]].name)):
+        for node in units[number]:
+            entry = OrderedDict([
+                ("name", projects[node].name),
+                ("level", level[number]),
+                ("weight", node_weights[node]),
+                ("start", start[number]),
+                ("finish", finish[number]),
+            ])
+            if worker is not None:
+                entry["worker"] = worker[number]
+            schedule.append(entry)
+
+    total_weight = sum(weight)
+    critical_weight = sum(weight[number] for number in critical_path)
+    return OrderedDict([
+        ("projects", sum(len(unit) for unit in units)),
+        ("total_weight", total_weight),
+        ("critical_path_weight", critical_weight),
+        ("parallelism", total_weight / critical_weight if critical_weight else 1.0),
+        ("build_jobs", build_jobs),
+        ("makespan", max(finish, default=0.0)),
+        ("levels", [OrderedDict([
+            ("level", number + 1),
+            ("width", len(names)),
+            ("projects", sorted(names)),
+        ]) for number, names in enumerate(levels)]),
+        ("critical_path", [projects[node].name for number in critical_path for node in units[number]]),
+        ("schedule", schedule),
+    ])
+
+
+def get_list_schedule(weight, deps, dependants, build_jobs, names):
+    # schedules units on build_jobs workers. whenever a worker is free, it
+    # picks the ready unit with the longest chain of dependants left.
+    count = len(weight)
+    remaining = [0.0] * count
+    for number in reversed(range(count)):
+        remaining[number] = weight[number] + max((remaining[dependant] for dependant in dependants[number]),
+                                                 default=0.0)
+
+    waiting = [len(unit_deps) for unit_deps in deps]
+    ready = [(-remaining[number], names[number], number) for number in range(count) if not waiting[number]]
+    heapq.heapify(ready)
+    workers = list(range(build_jobs))
+    running = []
+    start = [0.0] * count
+    worker = [0] * count
+    now = 0.0
+
+    while ready or running:
+        while ready and workers:
+            number = heapq.heappop(ready)[2]
+            start[number] = now
+            worker[number] = heapq.heappop(workers)
+            heapq.heappush(running, (now + weight[number], number))
+
+        now, number = heapq.heappop(running)
+        finished = [number]
+        while running and running[0][0] == now:
+            finished.append(heapq.heappop(running)[1])
+
+        for number in finished:
+            heapq.heappush(workers, worker[number])
+            for dependant in dependants[number]:
+                waiting[dependant] -= 1
+                if not waiting[dependant]:
+                    heapq.heappush(ready, (-remaining[dependant], names[dependant], dependant))
+
+    return start, worker
+
+
+def get_declared_edges(graph):
+    return set((graph.projects[node].id, graph.projects[dep].id)
+               for node, deps in enumerate(graph.declared_dependencies) for dep in deps)
+
+
+def diff_graphs(old, new, context=1):
+    # the projects and declared dependencies added or removed between two
+    # graphs, matched by project-id. projects whose name or dependencies
+    # changed are included as changed, along with the projects they gained or
+    # lost as dependencies, and the projects up to context dependencies away
+    # from any change, in either direction.
+    old_projects = dict((project.id, project) for project in reversed(old.projects))
+    new_projects = dict((project.id, project) for project in reversed(new.projects))
+    old_edges = get_declared_edges(old)
+    new_edges = get_declared_edges(new)
+
+    status = {}
+    for id in old_projects:
+        if id not in new_projects:
+            status[id] = "removed"
+    for id, project in new_projects.items():
+        if id not in old_projects:
+            status[id] = "added"
+        elif project.name != old_projects[id].name:
+            status[id] = "changed"
+
+    added_edges = new_edges - old_edges
+    removed_edges = old_edges - new_edges
+    for source, target in added_edges | removed_edges:
+        status.setdefault(source, "changed")
+
+    changed = set(status)
+    for source, target in added_edges | removed_edges:
+        status.setdefault(target, "context")
+    neighbours = {}
+    for source, target in old_edges | new_edges:
+        neighbours.setdefault(source, []).append(target)
+        neighbours.setdefault(target, []).append(source)
+
+    level = list(changed)
+    for distance in range(context):
+        next_level = []
+        for id in level:
+            for neighbour in neighbours.get(id, []):
+                if neighbour not in status:
+                    status[neighbour] = "context"
+                    next_level.append(neighbour)
+        level = next_level
+
+    def get_name(id):
+        project = new_projects.get(id) or old_projects[id]
+        return project.name
+
+    edges = []
+    for source, target in old_edges | new_edges:
+        if source in status and target in status and (source in changed or target in changed):
+            if (source, target) in added_edges:
+                edge_status = "added"
+            elif (source, target) in removed_edges:
+                edge_status = "removed"
+            else:
+                edge_status = "unchanged"
+            edges.append((get_name(source), get_name(target), source, target, edge_status))
+
+    return OrderedDict([
+        ("projects", [OrderedDict([
+            ("name", name),
+            ("id", id),
+            ("status", status[id]),
+        ]) for name, id in sorted((get_name(id), id) for id in status)]),
+        ("dependencies", [OrderedDict([
+            ("from", source),
+            ("to", target),
+            ("status", edge_status),
+        ]) for source_name, target_name, source, target, edge_status in sorted(edges)]),
+    ])
 
 
 def filter_projects(rx, projects):
@@ -329,7 +1744,7 @@ def filter_projects(rx, projects):
         if not rx.match(str.lower(project.name)):
             result.append(project)
         else:
-            debug("Info: Excluding project {0}.".format(project.name))
+            debug("Info: Excluding project {0}.", project.name)
 
     return result
 
@@ -337,163 +1752,1323 @@ def filter_projects(rx, projects):
 def highlight_projects(rx, projects):
     for project in projects:
         if rx.match(str.lower(project.name)):
-            debug("Highlighting project {0}".format(project.name))
+            debug("Highlighting project {0}", project.name)
             project.highlight = True
 
 
-def render_dot_file(projects, highlight_all=False):
-    lines = []
+def get_name_prefix(name, depth):
+    # the first depth parts of a dotted project-name
+    return ".".join(name.split(".")[:depth])
+
+
+def get_name_groups(projects, depth):
+    # projects grouped by name-prefix, in order of first appearance
+    groups = OrderedDict()
+    for project in projects:
+        groups.setdefault(get_name_prefix(project.name, depth), []).append(project)
+    return groups
+
+
+def collapse_projects(projects, depth):
+    # replaces all projects sharing the first depth parts of their name with
+    # a single project, named by that prefix. dependencies between the groups
+    # are deduplicated, and dependencies within a group, or on projects not
+    # given, are left out.
+    groups = get_name_groups(projects, depth)
+    collapsed = {}
+    result = []
+    for prefix, members in groups.items():
+        group = Project(prefix, prefix, prefix)
+        group.is_missing_project = all(project.is_missing_project for project in members)
+        group.has_missing_projects = any(project.has_missing_projects for project in members)
+        group.highlight = any(project.highlight for project in members)
+        cycles = [project.cycle for project in members if project.cycle is not None]
+        group.cycle = min(cycles) if cycles else None
+        for project in members:
+            collapsed[project] = group
+        result.append(group)
+
+    def get_dependencies(group, deps):
+        found = set()
+        for dep in deps:
+            dep = collapsed.get(dep)
+            if dep is not None and dep is not group:
+                found.add(dep)
+        return sorted(found, key=lambda project: project.name)
+
+    for group in result:
+        members = groups[group.name]
+        group.dependant_projects = get_dependencies(
+            group, [dep for project in members for dep in project.dependant_projects])
+        group.declared_dependant_projects = get_dependencies(
+            group, [dep for project in members for dep in project.declared_dependant_projects])
+
+    result.sort(key=lambda project: project.name)
+    debug("Collapsed {0} projects into {1}", len(collapsed), len(result))
+    return result
+
 
-    lines.append("digraph {")
-    lines.append("    rankdir=\"TB\"")
-    lines.append("")
-    lines.append("    # apply theme")
-    lines.append("    bgcolor=\"{0}\"".format(style_attributes['bgcolor']))
-    lines.append("")
-    lines.append("    // defaults for edges and nodes can be specified")
-    lines.append("    node [ color=\"{0}\" fontcolor=\"{1}\" ]".format(
-        style_attributes['project.linecolor'],
-        style_attributes['project.fontcolor']
+def get_highlighted_dependencies(projects, highlight_all=False):
+    # returns all projects whose incoming dependencies should be highlighted:
+    # highlighted projects, projects declaring a dependency on a highlighted
+    # project, and with highlight_all, projects with a highlighted project
+    # among their nested dependencies.
+    #
+    # computed once for the whole graph, with a single reverse traversal
+    # from the highlighted projects, instead of once per rendered dependency.
+    result = set()
+    highlighted = []
+    dependants = {}
+
+    pending = list(projects)
+    seen = set(pending)
+    while pending:
+        project = pending.pop()
+        if project.highlight:
+            highlighted.append(project)
+            result.add(project)
+
+        for dep in project.declared_dependant_projects:
+            if dep.highlight:
+                result.add(project)
+            if dep not in seen:
+                seen.add(dep)
+                pending.append(dep)
+
+        for dep in project.dependant_projects:
+            dependants.setdefault(dep, []).append(project)
+            if dep not in seen:
+                seen.add(dep)
+                pending.append(dep)
+
+    if highlight_all:
+        reached = set()
+        pending = highlighted
+        while pending:
+            for dependant in dependants.get(pending.pop(), []):
+                if dependant not in reached:
+                    reached.add(dependant)
+                    pending.append(dependant)
+        result |= reached
+
+    return result
+
+
+def write_dot_header(write, style):
+    write("digraph {")
+    write("    rankdir=\"TB\"")
+    write("")
+    write("    # apply theme")
+    write("    bgcolor=\"{0}\"".format(style['bgcolor']))
+    write("")
+    write("    // defaults for edges and nodes can be specified")
+    write("    node [ color=\"{0}\" fontcolor=\"{1}\" ]".format(
+        style['project.linecolor'],
+        style['project.fontcolor']
     ))
-    lines.append("    edge [ color=\"{0}\" ]".format(
-        style_attributes['dependency.color']
+    write("    edge [ color=\"{0}\" ]".format(
+        style['dependency.color']
     ))
-    lines.append("")
-    lines.append("    # project declarations")
+    write("")
+    write("    # project declarations")
+
+
+def write_dot_file(projects, out, highlight_all=False, style=None, highlight_cycles=False, cluster=None):
+    # streams all statements straight to the given text-file object, so that
+    # output can be consumed while still being written. with cluster, projects
+    # sharing the first cluster parts of their name are drawn as a cluster.
+    if style is None:
+        style = style_attributes
+
+    def write(line):
+        out.write(line)
+        out.write("\n")
+
+    highlighted_deps = get_highlighted_dependencies(projects, highlight_all)
+
+    write_dot_header(write, style)
 
     # define projects
     # create nodes like this
     #  A [ label="First Node" shape="circle" ]
-    for project in projects:
+    def declare(project, indent="    "):
         id = project.get_friendly_id()
 
         styling = ""
         if project.highlight:
             styling = " fillcolor=\"{0}\" style={1} color=\"{2}\" fontcolor=\"#000000\"".format(
-                style_attributes['project.highlight.fillcolor'],
-                style_attributes['project.highlight.style'],
-                style_attributes['project.highlight.linecolor'],
-                style_attributes['project.highlight.fontcolor']
+                style['project.highlight.fillcolor'],
+                style['project.highlight.style'],
+                style['project.highlight.linecolor'],
+                style['project.highlight.fontcolor']
             )
         elif project.is_missing_project:
             styling = " fillcolor=\"{0}\" style={1} color=\"{2}\" fontcolor=\"#000000\"".format(
-                style_attributes['project.is_missing_project.fillcolor'],
-                style_attributes['project.is_missing_project.style'],
-                style_attributes['project.is_missing_project.linecolor'],
-                style_attributes['project.is_missing_project.fontcolor']
+                style['project.is_missing_project.fillcolor'],
+                style['project.is_missing_project.style'],
+                style['project.is_missing_project.linecolor'],
+                style['project.is_missing_project.fontcolor']
+            )
+        elif highlight_cycles and project.cycle is not None:
+            styling = " fillcolor=\"{0}\" style={1} color=\"{2}\" fontcolor=\"{3}\"".format(
+                style['project.cycle.fillcolor'],
+                style['project.cycle.style'],
+                style['project.cycle.linecolor'],
+                style['project.cycle.fontcolor']
             )
         elif project.has_missing_projects:
             styling = " fillcolor=\"{0}\" style={1} color=\"{2}\" fontcolor=\"#000000\"".format(
-                style_attributes['project.has_missing_projects.fillcolor'],
-                style_attributes['project.has_missing_projects.style'],
-                style_attributes['project.has_missing_projects.linecolor'],
-                style_attributes['project.has_missing_projects.fontcolor']
+                style['project.has_missing_projects.fillcolor'],
+                style['project.has_missing_projects.style'],
+                style['project.has_missing_projects.linecolor'],
+                style['project.has_missing_projects.fontcolor']
             )
 
-        lines.append("    {0} [ label=\"{1}\" {2} ]".format(id, project.name, styling))
+        write("{0}{1} [ label=\"{2}\" {3} ]".format(indent, id, project.name, styling))
+
+    if cluster is None:
+        for project in projects:
+            declare(project)
+    else:
+        for prefix, members in get_name_groups(projects, cluster).items():
+            if len(members) == 1:
+                declare(members[0])
+                continue
+
+            write("    subgraph cluster_{0} {{".format(get_friendly_id(prefix)))
+            write("        label=\"{0}\" color=\"{1}\" fontcolor=\"{2}\"".format(
+                prefix,
+                style['project.linecolor'],
+                style['project.fontcolor']
+            ))
+            for project in members:
+                declare(project, "        ")
+            write("    }")
 
     # apply dependencies
-    lines.append("")
-    lines.append("    # project dependencies")
+    write("")
+    write("    # project dependencies")
     for project in projects:
         proj1_id = project.get_friendly_id()
         for proj2 in project.dependant_projects:
             if proj2 is None:
-                log_warning("Unable to resolve dependency with ID {0} for project {1}".format(id, project.name))
+                log_warning("Unable to resolve dependency with ID {0} for project {1}", id, project.name)
             else:
               proj2_id = proj2.get_friendly_id()
               styling = ""
-              if proj2.highlight or proj2.has_declared_highlighted_dependencies() or (highlight_all and proj2.has_highlighted_dependencies()):
-                  styling = " [color=\"{0}\"]".format(style_attributes['project.highlight.fillcolor'])
+              if proj2 in highlighted_deps:
+                  styling = " [color=\"{0}\"]".format(style['project.highlight.fillcolor'])
+              elif highlight_cycles and proj2.cycle is not None and proj2.cycle == project.cycle:
+                  styling = " [color=\"{0}\"]".format(style['project.cycle.fillcolor'])
               elif proj2.is_missing_project or (project.has_missing_projects and proj2.has_missing_projects):
-                  styling = " [color=\"{0}\"]".format(style_attributes['project.is_missing_project.fillcolor'])
-              lines.append("    {0} -> {1}{2}".format(proj1_id, proj2_id, styling))
+                  styling = " [color=\"{0}\"]".format(style['project.is_missing_project.fillcolor'])
+              write("    {0} -> {1}{2}".format(proj1_id, proj2_id, styling))
+
+    write("")
+    out.write("}")
+
+
+def render_dot_file(projects, highlight_all=False, style=None, highlight_cycles=False, cluster=None):
+    out = io.StringIO()
+    write_dot_file(projects, out, highlight_all, style, highlight_cycles, cluster)
+    return out.getvalue()
+
+
+def write_json_file(projects, out, highlight_all=False):
+    # streams one project per line, so that large graphs are never held in
+    # memory as a single document.
+    highlighted_deps = get_highlighted_dependencies(projects, highlight_all)
+
+    out.write("{\"projects\": [")
+    for i, project in enumerate(projects):
+        deps = [dep for dep in project.dependant_projects if dep is not None]
+        declared_deps = [dep for dep in project.declared_dependant_projects if dep is not None]
+        out.write(",\n" if i else "\n")
+        out.write(json.dumps(OrderedDict([
+            ("name", project.name),
+            ("id", project.id),
+            ("filename", project.filename),
+            ("missing", project.is_missing_project),
+            ("has_missing_projects", project.has_missing_projects),
+            ("highlight", project.highlight),
+            ("cycle", project.cycle),
+            ("dependencies", [dep.id for dep in deps]),
+            ("declared_dependencies", [dep.id for dep in declared_deps]),
+            ("highlighted_dependencies", [dep.id for dep in deps if dep in highlighted_deps]),
+        ])))
+    out.write("\n]}\n")
+
+
+def get_flags(flags):
+    return ",".join(name for name, is_set in flags if is_set) or "-"
+
+
+def write_edge_list(projects, out, highlight_all=False):
+    # one tab-separated line per project, followed by one per edge:
+    #   project <id> <name> <flags>
+    #   edge <from-id> <to-id> <flags>
+    # edges are flagged as declared and/or reduced, the latter being the
+    # ones left after removing transitive dependencies.
+    highlighted_deps = get_highlighted_dependencies(projects, highlight_all)
 
-    lines.append("")
-    lines.append("}")
+    for project in projects:
+        out.write("project\t{0}\t{1}\t{2}\n".format(project.id, project.name, get_flags([
+            ("missing", project.is_missing_project),
+            ("has_missing_projects", project.has_missing_projects),
+            ("highlight", project.highlight),
+            ("cycle", project.cycle is not None),
+        ])))
 
-    return "\n".join(lines)
+    for project in projects:
+        deps = [dep for dep in project.dependant_projects if dep is not None]
+        declared_deps = [dep for dep in project.declared_dependant_projects if dep is not None]
+        for dep in declared_deps + [dep for dep in deps if dep not in declared_deps]:
+            out.write("edge\t{0}\t{1}\t{2}\n".format(project.id, dep.id, get_flags([
+                ("declared", dep in declared_deps),
+                ("reduced", dep in deps),
+                ("highlight", dep in deps and dep in highlighted_deps),
+            ])))
+
+
+# content-types and file-extensions of the supported output-formats
+output_formats = OrderedDict([
+    ("dot", "text/vnd.graphviz"),
+    ("json", "application/json"),
+    ("edgelist", "text/tab-separated-values"),
+])
+
+# content-types of the supported formats of reports, such as build-schedules
+report_formats = OrderedDict([
+    ("text", "text/plain"),
+    ("json", "application/json"),
+])
+
+output_extensions = {
+    "dot": ".dot",
+    "json": ".json",
+    "edgelist": ".tsv",
+}
 
 
-def process(sln_file, dot_file, exclude, highlight, highlight_all, keep_deps):
-    log_info("Parsing: {0}".format(sln_file))
-    set_working_basedir(sln_file)
-    lines = get_lines_from_file(sln_file)
-    projects = analyze_projects_in_solution(lines)
+def write_graph(projects, out, output_format="dot", highlight_all=False, style=None, highlight_cycles=False,
+                collapse=None, cluster=None):
+    if collapse is not None:
+        projects = collapse_projects(projects, collapse)
+
+    if output_format == "json":
+        write_json_file(projects, out, highlight_all)
+    elif output_format == "edgelist":
+        write_edge_list(projects, out, highlight_all)
+    else:
+        write_dot_file(projects, out, highlight_all, style, highlight_cycles, cluster)
+
+
+def write_project_list(projects, out, report_format="text"):
+    # as JSON, or as one project-name per line
+    if report_format == "json":
+        json.dump({"projects": [OrderedDict([
+            ("name", project.name),
+            ("id", project.id),
+            ("filename", project.filename),
+        ]) for project in projects]}, out, indent=2)
+        out.write("\n")
+    else:
+        for project in projects:
+            out.write(project.name)
+            out.write("\n")
+
+
+def get_changed_files(lines):
+    # one path per line, as listed by git diff --name-only
+    return [line.strip() for line in lines if line.strip()]
+
+
+def write_schedule(schedule, out, report_format="text"):
+    # as JSON, or as a readable report
+    if report_format == "json":
+        json.dump(schedule, out, indent=2)
+        out.write("\n")
+        return
+
+    widest = max(schedule["levels"], key=lambda level: level["width"], default=None)
+    out.write("Projects: {0}\n".format(schedule["projects"]))
+    out.write("Levels: {0}, widest: {1}\n".format(len(schedule["levels"]), widest["width"] if widest else 0))
+    out.write("Total weight: {0:g}, critical path: {1:g}, parallelism: {2:.1f}\n".format(
+        schedule["total_weight"], schedule["critical_path_weight"], schedule["parallelism"]))
+    if schedule["build_jobs"]:
+        out.write("Makespan on {0} jobs: {1:g}\n".format(schedule["build_jobs"], schedule["makespan"]))
+
+    out.write("\nCritical path:\n")
+    for name in schedule["critical_path"]:
+        out.write("    {0}\n".format(name))
+
+    out.write("\nLevels:\n")
+    for level in schedule["levels"]:
+        out.write("    {0}: {1} projects\n".format(level["level"], level["width"]))
+
+    out.write("\nSchedule (start, finish{0}, project):\n".format(", job" if schedule["build_jobs"] else ""))
+    for entry in schedule["schedule"]:
+        worker = "\t{0}".format(entry["worker"]) if "worker" in entry else ""
+        out.write("    {0:g}\t{1:g}{2}\t{3}\n".format(entry["start"], entry["finish"], worker, entry["name"]))
+
+
+def write_diff(diff, out, output_format="dot", style=None):
+    # the changes between two graphs, as dot, JSON or an edge-list
+    if style is None:
+        style = style_attributes
+
+    if output_format == "json":
+        json.dump(diff, out, indent=2)
+        out.write("\n")
+        return
+
+    if output_format == "edgelist":
+        for project in diff["projects"]:
+            out.write("project\t{0}\t{1}\t{2}\n".format(project["id"], project["name"], project["status"]))
+        for dependency in diff["dependencies"]:
+            out.write("edge\t{0}\t{1}\t{2}\n".format(dependency["from"], dependency["to"], dependency["status"]))
+        return
+
+    def write(line):
+        out.write(line)
+        out.write("\n")
+
+    colors = {
+        "added": style['diff.added.color'],
+        "removed": style['diff.removed.color'],
+        "changed": style['project.highlight.fillcolor'],
+    }
+
+    write_dot_header(write, style)
+    names = {}
+    for project in diff["projects"]:
+        names[project["id"]] = get_friendly_id(project["name"])
+        styling = ""
+        if project["status"] in colors:
+            styling = " fillcolor=\"{0}\" style=filled color=\"#000000\" fontcolor=\"#000000\"".format(
+                colors[project["status"]])
+        write("    {0} [ label=\"{1}\" {2} ]".format(names[project["id"]], project["name"], styling))
+
+    write("")
+    write("    # project dependencies")
+    for dependency in diff["dependencies"]:
+        styling = ""
+        if dependency["status"] == "added":
+            styling = " [color=\"{0}\"]".format(colors["added"])
+        elif dependency["status"] == "removed":
+            styling = " [color=\"{0}\" style=dashed]".format(colors["removed"])
+        write("    {0} -> {1}{2}".format(names[dependency["from"]], names[dependency["to"]], styling))
+
+    write("")
+    out.write("}")
+
+
+def get_cache_file(directory, cache_file):
+    # an empty cache-file means the default location in the given directory
+    if cache_file == "":
+        return os.path.join(directory, ".slnviz-cache")
+    return cache_file
+
+
+def get_solution_files(patterns):
+    # expands globs, but keeps patterns which don't match anything, so that
+    # missing files are reported when they are opened.
+    sln_files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        sln_files.extend(matches if matches else [pattern])
+    return sln_files
+
+
+def get_output_files(output_dir, sln_files, extension=".dot"):
+    # every solution is written to a file named after it. solutions with the
+    # same name in different directories are named after their path from
+    # the directory they have in common instead, so none is overwritten.
+    names = [os.path.splitext(os.path.basename(sln_file))[0] for sln_file in sln_files]
+    for name in set(names):
+        duplicates = [i for i in range(len(names)) if names[i] == name]
+        if len(duplicates) < 2:
+            continue
+
+        paths = [os.path.abspath(sln_files[i]) for i in duplicates]
+        if len(set(paths)) < 2:
+            continue
+
+        common = os.path.commonpath(paths)
+        for i, path in zip(duplicates, paths):
+            names[i] = os.path.splitext(os.path.relpath(path, common))[0].replace(os.sep, ".")
+
+    return OrderedDict((sln_file, os.path.join(output_dir, name + extension))
+                       for sln_file, name in zip(sln_files, names))
+
+
+def get_solution_dir(sln_file):
+    return get_directory(get_unix_path(sln_file))
+
+
+def count_edges(dependencies):
+    return sum(len(deps) for deps in dependencies)
+
+
+def log_cycles(graph):
+    cycles = graph.find_cycles()
+    for cycle in cycles:
+        names = sorted(graph.projects[node].name for node in cycle)
+        log_warning("Dependency cycle between projects: {0}", ", ".join(names))
+    return cycles
+
+
+def load_solution(sln_file, keep_deps, jobs=1, cache=None, profiler=None, *, focus=None, depth=None, exclude=None):
+    # with exclude, projects matching it are left out before their
+    # project-files are read, unless other projects depend on them
+    if profiler is None:
+        profiler = Profiler()
+
+    log_info("Parsing: {0}", sln_file)
+    solution_dir = get_solution_dir(sln_file)
+    debug("Base-solution dir set to {0}", solution_dir)
+
+    with profiler.stage("parse-solution", hot=True):
+        projects = parse_solution_projects(get_lines_from_file(sln_file), solution_dir)
+    # project-files read are counted by the cache
+    profiler.count("bytes_read", os.path.getsize(sln_file))
+
+    with profiler.stage("parse-project-files", hot=True):
+        if focus is not None:
+            projects = expand_focused_projects(projects, re.compile(str.lower(focus)), depth, jobs, cache)
+        elif exclude is not None:
+            count = len(projects)
+            projects = skip_excluded_projects(projects, re.compile(str.lower(exclude)), jobs, cache)
+            profiler.count("projects_skipped", count - len(projects))
+        else:
+            # pull in dependencies declared in project-files
+            apply_declared_project_dependencies(projects, jobs, cache)
+
+    return build_project_graph(projects, keep_deps, profiler)
+
+
+def build_project_graph(projects, keep_deps, profiler):
+    # resolves the dependencies of the projects into a graph, and removes
+    # transitive dependencies unless asked to keep them
+    with profiler.stage("resolve", hot=True):
+        graph = create_project_graph(projects)
+
+    profiler.count("cycles", len(log_cycles(graph)))
+    profiler.count("projects", len(graph))
+    profiler.count("edges_declared", count_edges(graph.declared_dependencies))
 
     if not keep_deps:
         debug("Removing redundant dependencies...")
-        remove_transitive_dependencies(projects)
+        with profiler.stage("reduce", hot=True):
+            merged = graph.remove_all_transitive_dependencies()
+        profiler.count("closure_edges_merged", merged)
+
+    profiler.count("edges_reduced", count_edges(graph.dependencies))
+
+    return graph
+
+
+def load_directory(root, keep_deps, jobs=1, cache=None, profiler=None, *, ignore=None):
+    # same as load_solution, but for all project-files found below root
+    if profiler is None:
+        profiler = Profiler()
+
+    log_info("Scanning: {0}", root)
+
+    with profiler.stage("parse-project-files", hot=True):
+        projects = scan_projects(root, jobs, cache, ignore)
+
+    return build_project_graph(projects, keep_deps, profiler)
+
+
+def update_solution(graph, sln_file, keep_deps, jobs=1, cache=None):
+    # reads the solution again, and updates the graph in place for projects
+    # whose dependencies have changed. project-files which haven't changed
+    # are served from the cache.
+    # returns False if projects were added or removed, and the graph must
+    # be loaded again from scratch.
+    lines = get_lines_from_file(sln_file)
+    projects = parse_solution_projects(lines, get_solution_dir(sln_file))
+    apply_declared_project_dependencies(projects, jobs, cache)
+
+    current = [project for project in graph.projects if not project.is_missing_project]
+    if [(p.name, p.filename, p.id) for p in projects] != [(p.name, p.filename, p.id) for p in current]:
+        return False
+
+    changed = []
+    for old, new in zip(current, projects):
+        # the graph lists dependencies in its own order
+        if set(old.dependant_ids) != set(new.dependant_ids):
+            debug("--Project {0}-- Dependencies changed", old.name)
+            node = graph.nodes[old]
+            graph.update_dependency_ids(node, new.dependant_ids)
+            changed.append(node)
+
+    # missing projects no longer referenced would linger in the graph
+    dependants = graph.get_dependants()
+    for node, project in enumerate(graph.projects):
+        if project.is_missing_project and not dependants[node]:
+            return False
+
+    if changed:
+        log_cycles(graph)
+        if not keep_deps:
+            graph.update_transitive_dependencies(changed)
+
+    return True
+
+
+def get_watched_files(sln_file, graph):
+    return [sln_file] + [project.get_full_project_file_path() for project in graph.projects if not project.is_missing_project]
+
+
+def get_file_stats(files):
+    stats = {}
+    for file in files:
+        try:
+            stat = os.stat(file)
+            stats[file] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stats[file] = None
+    return stats
+
+
+def watch_solution(sln_file, projects, keep_deps, jobs, cache, interval, on_change, *, focus=None, depth=None,
+                   exclude=None):
+    # polls the solution and all its project-files for changes, and updates
+    # the graph incrementally whenever something has changed.
+    log_info("Watching '{0}' for changes. Press Ctrl+C to stop.", sln_file)
+    stats = get_file_stats(get_watched_files(sln_file, projects))
+    get_logger().flush()
+
+    try:
+        while True:
+            time.sleep(interval)
+            current = get_file_stats(stats)
+            if current == stats:
+                continue
+
+            for file in current:
+                if current[file] != stats[file]:
+                    log_info("Changed: {0}", file)
+
+            # focused graphs, and graphs without the excluded projects, may
+            # reach other projects after any change
+            try:
+                if focus is not None or exclude is not None or \
+                        not update_solution(projects, sln_file, keep_deps, jobs, cache):
+                    debug("Projects added or removed. Reloading solution.")
+                    projects = load_solution(sln_file, keep_deps, jobs, cache, focus=focus, depth=depth,
+                                             exclude=exclude)
+            except (ET.ParseError, OSError) as e:
+                # files are briefly half-written or gone while being saved.
+                # keep the previous graph, and try again on the next poll.
+                log_warning("Couldn't update '{0}': {1}. Retrying.", sln_file, e)
+                get_logger().flush()
+                continue
+
+            if cache is not None:
+                cache.save()
+
+            on_change(projects)
+            get_logger().flush()
+
+            watched = get_watched_files(sln_file, projects)
+            stats = get_file_stats([file for file in watched if file not in current])
+            stats.update((file, current[file]) for file in watched if file in current)
+    except KeyboardInterrupt:
+        log_info("Stopped watching '{0}'.", sln_file)
+        get_logger().flush()
+
+
+def write_output(projects, dot_file, exclude, highlight, highlight_all, *, profiler=None, style=None,
+                 output_format="dot", highlight_cycles=False, collapse=None, cluster=None):
+    if profiler is None:
+        profiler = Profiler()
 
     if exclude:
         debug("Excluding projects...")
-        excluder = re.compile(str.lower(exclude))
-        projects = filter_projects(excluder, projects)
+        with profiler.stage("filter"):
+            excluder = re.compile(str.lower(exclude))
+            projects = filter_projects(excluder, projects)
 
     if highlight:
         debug("Highlighting projects...")
-        highlighter = re.compile(str.lower(highlight))
-        highlight_projects(highlighter, projects)
+        with profiler.stage("highlight"):
+            highlighter = re.compile(str.lower(highlight))
+            highlight_projects(highlighter, projects)
 
-    txt = render_dot_file(projects, highlight_all)
+    with profiler.stage("render"):
+        write_to_output(dot_file, lambda out: write_graph(projects, out, output_format, highlight_all, style,
+                                                          highlight_cycles, collapse, cluster))
+
+
+def use_output(output_file):
+    # keep logs out of the output, when it is written to stdout
+    if output_file == "-":
+        get_logger().stream = sys.stderr
 
-    with open(dot_file, 'w') as f:
-        f.write(txt)
 
-    log_info("Wrote output-file '{0}'.".format(dot_file))
+def write_to_output(output_file, write):
+    # calls write with the file to write to, or with stdout for "-"
+    if output_file == "-":
+        write(sys.stdout)
+        sys.stdout.flush()
+    else:
+        with open(output_file, 'w') as f:
+            write(f)
+        log_info("Wrote output-file '{0}'.", output_file)
 
 
-def set_style(theme, attributes):
-    global style_attributes
+def load_declared_graph(source, scan=False, jobs=1, cache=None, profiler=None, ignore=None):
+    # the declared dependencies of a solution, or of a directory to scan
+    # when scan is set
+    if scan:
+        graph = load_directory(source, True, jobs, cache, profiler, ignore=ignore)
+    else:
+        graph = load_solution(source, True, jobs, cache, profiler)
+    if cache is not None:
+        cache.save()
+    return graph
+
+
+def process(sln_file, dot_file, exclude, highlight, highlight_all, keep_deps, *, jobs=1, cache=None,
+            watch=False, watch_interval=1.0, profiler=None, style=None, output_format="dot", focus=None, depth=None,
+            highlight_cycles=False, exclude_early=False, collapse=None, cluster=None):
+    # with exclude_early, the project-files of excluded projects are only
+    # read when other projects depend on them
+    use_output(dot_file)
 
+    if cache is None and watch:
+        # only keep parsed project-files in memory
+        cache = ProjectFileCache()
+
+    early_exclude = exclude if exclude_early else None
+    projects = load_solution(sln_file, keep_deps, jobs, cache, profiler, focus=focus, depth=depth,
+                             exclude=early_exclude)
+    if cache is not None:
+        cache.save()
+
+    def on_change(projects, profiler=None):
+        write_output(projects, dot_file, exclude, highlight, highlight_all, profiler=profiler, style=style,
+                     output_format=output_format, highlight_cycles=highlight_cycles, collapse=collapse,
+                     cluster=cluster)
+
+    on_change(projects, profiler)
+
+    if watch:
+        watch_solution(sln_file, projects, keep_deps, jobs, cache, watch_interval, on_change,
+                       focus=focus, depth=depth, exclude=early_exclude)
+
+    get_logger().flush()
+
+
+def process_directory(root, dot_file, exclude, highlight, highlight_all, keep_deps, *, jobs=1, cache=None,
+                      profiler=None, style=None, output_format="dot", highlight_cycles=False, ignore=None,
+                      collapse=None, cluster=None):
+    use_output(dot_file)
+
+    projects = load_directory(root, keep_deps, jobs, cache, profiler, ignore=ignore)
+    if cache is not None:
+        cache.save()
+
+    write_output(projects, dot_file, exclude, highlight, highlight_all, profiler=profiler, style=style,
+                 output_format=output_format, highlight_cycles=highlight_cycles, collapse=collapse,
+                 cluster=cluster)
+    get_logger().flush()
+
+
+def process_impact(source, output_file, changed_files, *, jobs=1, cache=None, profiler=None, report_format="text",
+                   scan=False, ignore=None):
+    # writes the projects affected by changes to the given files. source is
+    # a solution, or a directory to scan when scan is set.
+    if profiler is None:
+        profiler = Profiler()
+
+    use_output(output_file)
+    graph = load_declared_graph(source, scan, jobs, cache, profiler, ignore)
+
+    with profiler.stage("impact-index"):
+        index = ImpactIndex(graph)
+    with profiler.stage("impact"):
+        projects = index.get_affected(changed_files)
+    log_info("{0} of {1} projects affected by {2} changed files.", len(projects), len(graph), len(changed_files))
+
+    write_to_output(output_file, lambda out: write_project_list(projects, out, report_format))
+    get_logger().flush()
+
+
+def process_schedule(source, output_file, *, jobs=1, cache=None, profiler=None, report_format="text",
+                     weights=None, build_jobs=None, scan=False, ignore=None):
+    # writes the build-schedule of a solution, or of a directory to scan
+    # when scan is set. weights are "size", or build-weights per project.
+    if profiler is None:
+        profiler = Profiler()
+
+    use_output(output_file)
+    graph = load_declared_graph(source, scan, jobs, cache, profiler, ignore)
+
+    with profiler.stage("schedule"):
+        schedule = get_build_schedule(graph, weights, build_jobs)
+
+    write_to_output(output_file, lambda out: write_schedule(schedule, out, report_format))
+    get_logger().flush()
+
+
+def process_diff(old_source, new_source, output_file, *, jobs=1, cache=None, profiler=None, style=None,
+                 output_format="dot", context=1):
+    # writes the changes between two solutions, or two directories. both
+    # share a cache validated by content-hash, so that project-files which
+    # are the same in both are only parsed once.
+    if profiler is None:
+        profiler = Profiler()
+    if cache is None:
+        cache = ProjectFileCache(None, True)
+
+    use_output(output_file)
+    old = load_declared_graph(old_source, os.path.isdir(old_source), jobs, cache, profiler)
+    new = load_declared_graph(new_source, os.path.isdir(new_source), jobs, cache, profiler)
+
+    with profiler.stage("diff"):
+        diff = diff_graphs(old, new, context)
+    log_info("{0} projects and {1} dependencies changed.",
+             len([project for project in diff["projects"] if project["status"] != "context"]),
+             len([dependency for dependency in diff["dependencies"] if dependency["status"] != "unchanged"]))
+
+    write_to_output(output_file, lambda out: write_diff(diff, out, output_format, style))
+    get_logger().flush()
+
+
+def process_batch(sln_files, output_dir, exclude, highlight, highlight_all, keep_deps, *, jobs=1, cache=None,
+                  solution_jobs=1, profiler=None, style=None, output_format="dot", focus=None, depth=None,
+                  highlight_cycles=False, exclude_early=False, collapse=None, cluster=None):
+    # all solutions share one cache, so that project-files used by several
+    # solutions are only parsed once.
+    if cache is None:
+        cache = ProjectFileCache()
+
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    # worker-threads log to the same logger as the caller
+    active = get_logger()
+    early_exclude = exclude if exclude_early else None
+    output_files = get_output_files(output_dir, sln_files, output_extensions[output_format])
+
+    def process_solution(sln_file):
+        with use_logger(active):
+            dot_file = output_files[sln_file]
+            projects = load_solution(sln_file, keep_deps, jobs, cache, profiler, focus=focus, depth=depth,
+                                     exclude=early_exclude)
+            write_output(projects, dot_file, exclude, highlight, highlight_all, profiler=profiler, style=style,
+                         output_format=output_format, highlight_cycles=highlight_cycles, collapse=collapse,
+                         cluster=cluster)
+
+    if solution_jobs > 1:
+        with ThreadPoolExecutor(max_workers=solution_jobs) as executor:
+            list(executor.map(process_solution, sln_files))
+    else:
+        for sln_file in sln_files:
+            process_solution(sln_file)
+
+    cache.save()
+    get_logger().flush()
+
+
+def get_style(theme, attributes):
+    # returns a copy of the theme with the given attributes overridden. the
+    # themes themselves are never modified.
     if not theme:
         theme = 'dark'
 
-    debug("Using {0} theme".format(theme))
-    style_attributes = themes[theme]
+    debug("Using {0} theme", theme)
+    style = dict(themes[theme])
 
     if attributes:
         for attr in attributes:
             name, value = attr
-            if name not in style_attributes:
-                log_error("Unknown style attribute defined: {0}".format(name))
+            if name not in style:
+                log_error("Unknown style attribute defined: {0}", name)
             else:
-                debug("Overriding style {0}".format(name))
-                style_attributes[name] = value
+                debug("Overriding style {0}", name)
+                style[name] = value
+
+    return style
+
+
+def set_style(theme, attributes):
+    global style_attributes
+    style_attributes = get_style(theme, attributes)
 
 
 def write_logs(logfile: str, must_append: bool):
-    if logfile:
-        with open(logfile, "a" if must_append else "w") as log_file:
-            log_file.writelines(["{0}:{1}\n".format(msg.level.value, msg.text) for msg in messages])
+    get_logger().write_logs(logfile, must_append)
+
+
+class Analyzer(object):
+    # Owns everything an analysis depends on: configuration, style, logs and
+    # the cache of parsed project-files. Nothing is shared between analyzers,
+    # so several can run side by side in one process.
+
+    def __init__(self, keep_deps=False, jobs=1, cache=None, theme=None, style=None, logger=None, profiler=None,
+                 highlight_cycles=False, collapse=None, cluster=None):
+        self.keep_deps = keep_deps
+        self.jobs = jobs
+        self.cache = cache
+        self.highlight_cycles = highlight_cycles
+        self.collapse = collapse
+        self.cluster = cluster
+        self.logger = logger if logger is not None else Logger()
+        self.profiler = profiler if profiler is not None else Profiler()
+
+        with use_logger(self.logger):
+            self.style = get_style(theme, style)
+
+    def parse(self, sln_file):
+        # returns the graph of projects, with all declared dependencies
+        with use_logger(self.logger):
+            return load_solution(sln_file, True, self.jobs, self.cache, self.profiler)
+
+    def reduce(self, graph):
+        with use_logger(self.logger):
+            debug("Removing redundant dependencies...")
+            with self.profiler.stage("reduce", hot=True):
+                remove_transitive_dependencies(graph)
+        return graph
+
+    def analyze(self, sln_file, focus=None, depth=None, exclude=None):
+        # parses the solution, and reduces it unless configured not to. with
+        # focus, only projects reachable from the matching ones are parsed,
+        # and with exclude, projects matching it are left out unless other
+        # projects depend on them.
+        with use_logger(self.logger):
+            return load_solution(sln_file, self.keep_deps, self.jobs, self.cache, self.profiler, focus=focus,
+                                 depth=depth, exclude=exclude)
+
+    def scan(self, root, ignore=None):
+        # like analyze, but for all project-files found below root
+        with use_logger(self.logger):
+            return load_directory(root, self.keep_deps, self.jobs, self.cache, self.profiler, ignore=ignore)
+
+    def filter(self, projects, exclude):
+        with use_logger(self.logger):
+            return filter_projects(re.compile(str.lower(exclude)), projects)
+
+    def highlight(self, projects, highlight):
+        with use_logger(self.logger):
+            highlight_projects(re.compile(str.lower(highlight)), projects)
+        return projects
+
+    def render(self, projects, out=None, highlight_all=False, output_format="dot"):
+        # writes to the given text-file object, or returns the graph as text
+        with use_logger(self.logger):
+            if out is None:
+                out = io.StringIO()
+                write_graph(projects, out, output_format, highlight_all, self.style, self.highlight_cycles,
+                            self.collapse, self.cluster)
+                return out.getvalue()
+            write_graph(projects, out, output_format, highlight_all, self.style, self.highlight_cycles,
+                        self.collapse, self.cluster)
+
+    def process(self, sln_file, dot_file, exclude=None, highlight=None, highlight_all=False, *,
+                watch=False, watch_interval=1.0, output_format="dot", focus=None, depth=None, exclude_early=False):
+        with use_logger(self.logger):
+            process(sln_file, dot_file, exclude, highlight, highlight_all, self.keep_deps, jobs=self.jobs,
+                    cache=self.cache, watch=watch, watch_interval=watch_interval, profiler=self.profiler,
+                    style=self.style, output_format=output_format, focus=focus, depth=depth,
+                    highlight_cycles=self.highlight_cycles, exclude_early=exclude_early, collapse=self.collapse,
+                    cluster=self.cluster)
+
+    def process_directory(self, root, dot_file, exclude=None, highlight=None, highlight_all=False, *,
+                          output_format="dot", ignore=None):
+        with use_logger(self.logger):
+            process_directory(root, dot_file, exclude, highlight, highlight_all, self.keep_deps, jobs=self.jobs,
+                              cache=self.cache, profiler=self.profiler, style=self.style, output_format=output_format,
+                              highlight_cycles=self.highlight_cycles, ignore=ignore, collapse=self.collapse,
+                              cluster=self.cluster)
+
+    def process_impact(self, source, output_file, changed_files, *, report_format="text", scan=False, ignore=None):
+        with use_logger(self.logger):
+            process_impact(source, output_file, changed_files, jobs=self.jobs, cache=self.cache,
+                           profiler=self.profiler, report_format=report_format, scan=scan, ignore=ignore)
+
+    def process_schedule(self, source, output_file, *, report_format="text", weights=None, build_jobs=None,
+                         scan=False, ignore=None):
+        with use_logger(self.logger):
+            process_schedule(source, output_file, jobs=self.jobs, cache=self.cache, profiler=self.profiler,
+                             report_format=report_format, weights=weights, build_jobs=build_jobs, scan=scan,
+                             ignore=ignore)
+
+    def process_diff(self, old_source, new_source, output_file, *, output_format="dot", context=1):
+        with use_logger(self.logger):
+            process_diff(old_source, new_source, output_file, jobs=self.jobs, cache=self.cache,
+                         profiler=self.profiler, style=self.style, output_format=output_format, context=context)
+
+    def process_batch(self, sln_files, output_dir, exclude=None, highlight=None, highlight_all=False, *,
+                      solution_jobs=1, output_format="dot", focus=None, depth=None, exclude_early=False):
+        with use_logger(self.logger):
+            process_batch(sln_files, output_dir, exclude, highlight, highlight_all, self.keep_deps, jobs=self.jobs,
+                          cache=self.cache, solution_jobs=solution_jobs, profiler=self.profiler, style=self.style,
+                          output_format=output_format, focus=focus, depth=depth,
+                          highlight_cycles=self.highlight_cycles, exclude_early=exclude_early,
+                          collapse=self.collapse, cluster=self.cluster)
+
+
+class GraphCache(object):
+    # Keeps the most recently used graphs in memory, and loads them again
+    # once their solution or any of their project-files change on disk.
+    # Every solution has its own lock, so that it is only loaded once when
+    # requested concurrently, and so that highlighting one request doesn't
+    # leak into another.
+
+    def __init__(self, analyzer, size=16):
+        self.analyzer = analyzer
+        self.size = size
+        self.entries = OrderedDict()
+        self.indexes = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def is_current(self, entry):
+        graph, stats = entry
+        return get_file_stats(stats) == stats
+
+    @contextmanager
+    def use_graph(self, sln_file):
+        sln_file = os.path.abspath(sln_file)
+        with self.lock:
+            solution_lock = self.locks.setdefault(sln_file, threading.Lock())
+
+        with solution_lock:
+            with self.lock:
+                entry = self.entries.get(sln_file)
+
+            if entry is not None and self.is_current(entry):
+                with self.lock:
+                    self.entries.move_to_end(sln_file)
+                    self.hits += 1
+            else:
+                graph = self.analyzer.analyze(sln_file)
+                entry = (graph, get_file_stats(get_watched_files(sln_file, graph)))
+                with self.lock:
+                    self.entries[sln_file] = entry
+                    self.entries.move_to_end(sln_file)
+                    self.loads += 1
+                    while len(self.entries) > self.size:
+                        evicted, _ = self.entries.popitem(last=False)
+                        self.indexes.pop(evicted, None)
+                        debug("Evicted '{0}' from graph-cache", evicted)
+
+            yield entry[0]
+
+    def render(self, sln_file, output_format="dot", exclude=None, highlight=None, highlight_all=False):
+        # only filtering and rendering is repeated for every request
+        with self.use_graph(sln_file) as graph:
+            for project in graph:
+                project.highlight = False
+
+            projects = graph
+            if exclude:
+                projects = self.analyzer.filter(projects, exclude)
+            if highlight:
+                self.analyzer.highlight(projects, highlight)
+
+            return self.analyzer.render(projects, None, highlight_all, output_format)
+
+    def get_affected(self, sln_file, paths, base="."):
+        # the impact-index is only built once for every graph loaded
+        with self.use_graph(sln_file) as graph:
+            sln_file = os.path.abspath(sln_file)
+            with self.lock:
+                index = self.indexes.get(sln_file)
+            if index is None or index.graph is not graph:
+                index = ImpactIndex(graph)
+                with self.lock:
+                    self.indexes[sln_file] = index
+
+            return index.get_affected(paths, base)
+
+
+class GraphRequestHandler(BaseHTTPRequestHandler):
+    # GET /graph?solution=<path>[&format=dot|json|edgelist][&exclude=<regex>][&highlight=<regex>][&highlight_all=1]
+    # GET /impact?solution=<path>&file=<path>[&file=<path>...][&base=<directory>][&format=json]
+
+    def do_GET(self):
+        with use_logger(self.server.analyzer.logger):
+            try:
+                status, content_type, body = self.get_response()
+            except Exception as e:
+                log_error("Request '{0}' failed: {1}", self.path, e)
+                status, content_type, body = 500, "text/plain", "Internal error\n"
+
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type + "; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            get_logger().flush()
+
+    def get_response(self):
+        url = urlparse(self.path)
+        if url.path not in ["/graph", "/impact"]:
+            return 404, "text/plain", "Not found\n"
+
+        query = parse_qs(url.query)
+
+        def get(name):
+            values = query.get(name)
+            return values[-1] if values else None
+
+        sln_file = get("solution")
+        if not sln_file:
+            return 400, "text/plain", "Missing parameter: solution\n"
+        if not os.path.isfile(sln_file):
+            return 404, "text/plain", "No such solution: {0}\n".format(sln_file)
+
+        if url.path == "/impact":
+            report_format = get("format") or "text"
+            if report_format not in report_formats:
+                return 400, "text/plain", "Unknown format: {0}\n".format(report_format)
+
+            projects = self.server.graphs.get_affected(sln_file, query.get("file", []), get("base") or ".")
+            out = io.StringIO()
+            write_project_list(projects, out, report_format)
+            return 200, report_formats[report_format], out.getvalue()
+
+        output_format = get("format") or "dot"
+        if output_format not in output_formats:
+            return 400, "text/plain", "Unknown format: {0}\n".format(output_format)
+
+        highlight_all = get("highlight_all") in ["1", "true"]
+        try:
+            body = self.server.graphs.render(sln_file, output_format, get("exclude"), get("highlight"), highlight_all)
+        except re.error as e:
+            return 400, "text/plain", "Invalid expression: {0}\n".format(e)
+
+        return 200, output_formats[output_format], body
+
+    def log_message(self, format, *args):
+        debug("{0} - {1}", self.address_string(), format % args)
+
+
+class GraphServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, analyzer, cache_size=16):
+        HTTPServer.__init__(self, server_address, GraphRequestHandler)
+        self.analyzer = analyzer
+        self.graphs = GraphCache(analyzer, cache_size)
+
+
+def serve(analyzer, address, port, cache_size=16):
+    server = GraphServer((address, port), analyzer, cache_size)
+    log_info("Serving graphs on http://{0}:{1}/graph?solution=<path>, and affected projects on " +
+             "/impact?solution=<path>&file=<path>. Press Ctrl+C to stop.", address, server.server_address[1])
+    get_logger().flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log_info("Stopped serving.")
+    finally:
+        server.server_close()
+        if analyzer.cache is not None:
+            analyzer.cache.save()
 
 
 def main():
-    global debug_output
-
     p = ArgumentParser()
-    p.add_argument("--input", "-i", help="The file to analyze.")
-    p.add_argument("--output", "-o", help="The file to write to.")
+    p.add_argument("--input", "-i", nargs="+",
+                   help="The file to analyze. Multiple files, or globs, can be given to process several solutions.")
+    p.add_argument("--scan", metavar="directory",
+                   help="Analyze all project-files found in this directory, and below it, instead of a solution")
+    p.add_argument("--scan-ignore", action="append", metavar="pattern",
+                   help="Skip directories matching this pattern when scanning, besides " + ", ".join(scan_ignore))
+    p.add_argument("--output", "-o",
+                   help="The file to write to, or - for stdout. The directory to write to, when processing several solutions.")
+    p.add_argument("--format", "-f", choices=list(output_formats) + ["text"],
+                   help="The format to write: GraphViz dot, JSON, or a tab-separated edge-list. Affected projects "
+                        "and build-schedules are written as text or JSON.")
     p.add_argument("--keep-declared-deps", "-k", action="store_true",
                    help="Don't remove redundant, transisitive dependencies in post-processing.")
     p.add_argument("--verbose", "-v", action="store_true", help="Enable verbose output")
     p.add_argument("--exclude", "-e", help="Filter projects matching this expression from the graph")
+    p.add_argument("--exclude-early", action="store_true",
+                   help="Don't read the project-files of excluded projects, unless other projects depend on them")
+    p.add_argument("--changed-files", nargs="?", const="-", metavar="file",
+                   help="List the projects affected by changes to the files listed in this file, or on stdin, " +
+                        "one per line. Relative paths are relative to the current directory.")
+    p.add_argument("--schedule", action="store_true",
+                   help="Write topological levels, the critical path and a parallel build-schedule, instead of a graph")
+    p.add_argument("--schedule-weights", metavar="size|file",
+                   help="Weigh projects by the size of their project-file, or by a CSV-file of project-names and " +
+                        "build-times, instead of 1 each")
+    p.add_argument("--schedule-jobs", type=int, metavar="count",
+                   help="Schedule builds on this many parallel jobs, instead of starting every project as early as possible")
+    p.add_argument("--diff", nargs=2, metavar=("old", "new"),
+                   help="Write only the projects and dependencies which differ between two solutions, or directories")
+    p.add_argument("--diff-context", type=int, default=1, metavar="levels",
+                   help="How many levels of unchanged neighbours to include around changes with --diff")
+    p.add_argument("--focus", help="Only include projects matching this expression, and the projects they depend on")
+    p.add_argument("--depth", type=int, metavar="levels",
+                   help="How many levels of dependencies to follow from the projects given by --focus")
     p.add_argument("--highlight", help="Highlights projects matching this expression in the graph")
     p.add_argument("--highlight-all", action="store_true", help="Highlight all paths leading to a highlighted project")
+    p.add_argument("--highlight-cycles", action="store_true",
+                   help="Highlight projects and dependencies which are part of a reference-cycle")
+    p.add_argument("--collapse", type=int, metavar="depth",
+                   help="Draw all projects sharing the first parts of their name as a single project")
+    p.add_argument("--cluster", type=int, nargs="?", const=1, metavar="depth",
+                   help="Draw projects sharing the first parts of their name (default: 1) in a cluster")
+    p.add_argument("--jobs", "-j", type=int, default=1, help="Number of project-files to parse in parallel")
+    p.add_argument("--cache", nargs="?", const="", metavar="file",
+                   help="Cache parsed project-files between runs (default: .slnviz-cache next to the solution, " +
+                        "or in the output directory, when processing several solutions)")
+    p.add_argument("--cache-hash", action="store_true",
+                   help="Validate cached project-files by content-hash when their timestamp has changed")
+    p.add_argument("--solution-jobs", type=int, default=1,
+                   help="Number of solutions to process in parallel, when processing several solutions")
+    p.add_argument("--watch", "-w", action="store_true",
+                   help="Keep running, and update the output whenever the solution or its project-files change")
+    p.add_argument("--watch-interval", type=float, default=1.0, metavar="seconds",
+                   help="How often to check for changes in watch-mode")
+
+    p.add_argument("--serve", type=int, metavar="port",
+                   help="Run a HTTP server, which returns the graph for /graph?solution=<path> on request")
+    p.add_argument("--bind", default="127.0.0.1", metavar="address", help="The address to serve on")
+    p.add_argument("--serve-cache-size", type=int, default=16, metavar="count",
+                   help="Number of parsed solutions to keep in memory when serving")
+
+    p.add_argument("--profile", metavar="file",
+                   help="Write wall- and CPU-time for every stage, along with counters, as JSON to this file")
+    p.add_argument("--profile-cprofile", metavar="file",
+                   help="Write cProfile-stats for parsing and reduction to this file")
 
     p.add_argument("--theme", "-t", help="select one of the defined themes")
     p.add_argument("--style", "-s", action="append", nargs=2, metavar=("attribute", "value"),
                    help="Provide style information for dot rendering")
     p.add_argument("--log", "-l", help="Log events to file")
     p.add_argument("--logappend", "-la", action="store_true", help="Append logs to file")
+    p.add_argument("--log-limit", type=int, default=10000, metavar="count",
+                   help="Maximum number of messages to keep for the log-file. Older messages are dropped.")
 
     args = p.parse_args()
-
-    debug_output = args.verbose
-
-    set_style(args.theme, args.style)
-    process(args.input, args.output, args.exclude, args.highlight, args.highlight_all, args.keep_declared_deps)
-    write_logs(args.log, args.logappend)
+    if not args.input and args.serve is None and args.scan is None and args.diff is None:
+        p.error("the following arguments are required: --input")
+    if args.scan is not None and (args.input or args.serve is not None or args.watch or args.focus is not None or
+                                  args.exclude_early):
+        p.error("--scan can't be combined with --input, --serve, --watch, --focus or --exclude-early")
+    if args.depth is not None and args.focus is None:
+        p.error("--depth can only be used with --focus")
+    if args.exclude_early and args.exclude is None:
+        p.error("--exclude-early can only be used with --exclude")
+    if args.schedule_jobs is not None and args.schedule_jobs < 1:
+        p.error("--schedule-jobs must be at least 1")
+    if args.collapse is not None and args.collapse < 1:
+        p.error("--collapse must be at least 1")
+    if args.cluster is not None and args.cluster < 1:
+        p.error("--cluster must be at least 1")
+
+    # affected projects and build-schedules are reports, not graphs
+    if args.changed_files is not None or args.schedule:
+        if args.format is None:
+            args.format = "text"
+        elif args.format not in report_formats:
+            p.error("affected projects and build-schedules are written as " + " or ".join(report_formats))
+    elif args.format is None:
+        args.format = "dot"
+    elif args.format not in output_formats:
+        p.error("graphs are written as " + ", ".join(output_formats))
+
+    level = MessageLevel.DEBUG if args.verbose else MessageLevel.INFO
+    # only keep messages around, when there is a log-file to write them to
+    log = Logger(level, args.log_limit if args.log else 0)
+
+    profiler = None
+    if args.profile or args.profile_cprofile:
+        profiler = Profiler(args.profile_cprofile)
+
+    analyzer = Analyzer(args.keep_declared_deps, args.jobs, None, args.theme, args.style, log, profiler,
+                        args.highlight_cycles, args.collapse, args.cluster)
+
+    with use_logger(log):
+        try:
+            sln_files = get_solution_files(args.input) if args.input else []
+            is_batch = len(sln_files) > 1
+
+            if args.cache is not None:
+                if is_batch:
+                    cache_dir = args.output
+                elif args.scan is not None:
+                    cache_dir = args.scan
+                elif args.diff is not None:
+                    cache_dir = args.diff[1] if os.path.isdir(args.diff[1]) else get_directory(args.diff[1])
+                elif sln_files:
+                    cache_dir = get_directory(sln_files[0])
+                else:
+                    cache_dir = "."
+                # diffs reuse project-files the same in both by content-hash
+                analyzer.cache = ProjectFileCache(get_cache_file(cache_dir, args.cache),
+                                                  args.cache_hash or args.diff is not None)
+            elif args.diff is not None:
+                analyzer.cache = ProjectFileCache(None, True)
+            elif profiler is not None or args.serve is not None:
+                # in-memory only, to count parsed project-files, or to only
+                # parse changed project-files when serving
+                analyzer.cache = ProjectFileCache()
+
+            if args.serve is not None:
+                serve(analyzer, args.bind, args.serve, args.serve_cache_size)
+            elif args.diff is not None:
+                analyzer.process_diff(args.diff[0], args.diff[1], args.output or "-", output_format=args.format,
+                                      context=args.diff_context)
+            elif args.changed_files is not None and is_batch:
+                log_error("Listing affected projects only supports a single solution.")
+            elif args.changed_files is not None:
+                if args.changed_files == "-":
+                    changed_files = get_changed_files(sys.stdin)
+                else:
+                    changed_files = get_changed_files(get_lines_from_file(args.changed_files))
+                source = args.scan if args.scan is not None else sln_files[0]
+                analyzer.process_impact(source, args.output or "-", changed_files, report_format=args.format,
+                                        scan=args.scan is not None, ignore=scan_ignore + (args.scan_ignore or []))
+            elif args.schedule and is_batch:
+                log_error("Build-schedules only support a single solution.")
+            elif args.schedule:
+                weights = args.schedule_weights
+                if weights is not None and weights != "size":
+                    weights = read_build_weights(weights)
+                source = args.scan if args.scan is not None else sln_files[0]
+                analyzer.process_schedule(source, args.output or "-", report_format=args.format, weights=weights,
+                                          build_jobs=args.schedule_jobs, scan=args.scan is not None,
+                                          ignore=scan_ignore + (args.scan_ignore or []))
+            elif args.scan is not None:
+                analyzer.process_directory(args.scan, args.output, args.exclude, args.highlight, args.highlight_all,
+                                           output_format=args.format,
+                                           ignore=scan_ignore + (args.scan_ignore or []))
+            elif not is_batch:
+                analyzer.process(sln_files[0], args.output, args.exclude, args.highlight, args.highlight_all,
+                                 watch=args.watch, watch_interval=args.watch_interval, output_format=args.format,
+                                 focus=args.focus, depth=args.depth, exclude_early=args.exclude_early)
+            elif args.watch:
+                log_error("Watch-mode only supports a single solution.")
+            else:
+                analyzer.process_batch(sln_files, args.output, args.exclude, args.highlight, args.highlight_all,
+                                       solution_jobs=args.solution_jobs, output_format=args.format,
+                                       focus=args.focus, depth=args.depth, exclude_early=args.exclude_early)
+
+            if profiler is not None:
+                for name, value in analyzer.cache.get_statistics().items():
+                    profiler.count(name, value)
+                profiler.log_summary()
+                profiler.write_report(args.profile)
+        finally:
+            log.flush()
+
+    log.write_logs(args.log, args.logappend)
 
 
 # don't run from unit-tests
@@ -1,7 +1,37 @@
+import io
+import json
+import os
+import tempfile
 import unittest
+from urllib.parse import urlencode
+from urllib.request import urlopen
+import benchmark
 import slnviz
 
 
+def write_project_file(tmp, name, references):
+    with open(os.path.join(tmp, name + ".csproj"), "w") as f:
+        f.write("<Project><ItemGroup>")
+        for reference in references:
+            f.write("<ProjectReference><Project>{{{0}}}</Project></ProjectReference>".format(reference))
+        f.write("</ItemGroup></Project>")
+
+
+def write_solution(tmp, projects):
+    # projects maps project-names to the names of the projects they
+    # reference. project-names double as GUIDs.
+    with open(os.path.join(tmp, "test.sln"), "w") as f:
+        for name in sorted(projects):
+            f.write("Project(\"{{FAE04EC0-301F-11D3-BF4B-00C04F79EFBC}}\") = \"{0}\", \"{0}.csproj\", \"{{{0}}}\"\n".format(name))
+            f.write("EndProject\n")
+        f.write("Global\nEndGlobal\n")
+
+    for name, references in projects.items():
+        write_project_file(tmp, name, references)
+
+    return os.path.join(tmp, "test.sln")
+
+
 class Tests(unittest.TestCase):
     def test_parse_project_declaration_regexp(self):
         decl = "	Project(\"{2150E333-8FDC-42A3-9474-1A3956D46DE8}\") = \"License\", \"License\", \"{A96EA6A0-2464-416D-8E69-3A06A7288A60}\""
@@ -44,6 +74,540 @@ EndProject
         self.assertEqual("MakeDistribution", projs[1].name)
         self.assertEqual(1, len(projs[1].dependant_ids))
 
+    def test_solution_scanner_only_reads_project_dependency_sections(self):
+        decl = """
+Project("{FAE04EC0-301F-11D3-BF4B-00C04F79EFBC}") = "A", "A\\A.csproj", "{AAAAAAAA-0000-0000-0000-000000000000}"
+    ProjectSection(SolutionItems) = preProject
+        {CCCCCCCC-0000-0000-0000-000000000000} = {CCCCCCCC-0000-0000-0000-000000000000}
+    EndProjectSection
+    ProjectSection(ProjectDependencies) = postProject
+        {BBBBBBBB-0000-0000-0000-000000000000} = {BBBBBBBB-0000-0000-0000-000000000000}
+    EndProjectSection
+EndProject
+Global
+    GlobalSection(NestedProjects) = preSolution
+        {DDDDDDDD-0000-0000-0000-000000000000} = {DDDDDDDD-0000-0000-0000-000000000000}
+    EndGlobalSection
+EndGlobal
+Project("{FAE04EC0-301F-11D3-BF4B-00C04F79EFBC}") = "B", "B\\B.csproj", "{BBBBBBBB-0000-0000-0000-000000000000}"
+EndProject"""
+
+        projects = slnviz.parse_solution_projects(iter(decl.split("\n")))
+
+        self.assertEqual(["A"], [project.name for project in projects])
+        self.assertEqual(["BBBBBBBB-0000-0000-0000-000000000000"], projects[0].dependant_ids)
+
+    def test_project_graph_resolution(self):
+        graph = slnviz.ProjectGraph()
+        a = slnviz.Project("A", "A.csproj", "A")
+        b = slnviz.Project("B", "B.csproj", "B")
+        graph.add_project(b)
+        graph.add_project(a)
+
+        a.add_dependency("B")
+        a.add_dependency("C")
+        b.add_dependency("C")
+        graph.resolve()
+
+        # missing projects are interned as nodes too
+        self.assertEqual(3, len(graph))
+        self.assertEqual(2, graph.get_node("C"))
+        self.assertEqual(True, graph.get_project("C").is_missing_project)
+
+        # iterated in alphabetical order, with dependencies sorted the same way
+        self.assertEqual(["A", "B", "Missing_C"], [project.name for project in graph])
+        self.assertEqual([0, 2], list(graph.declared_dependencies[1]))
+        self.assertEqual([b, graph.get_project("C")], a.dependant_projects)
+
+        graph.remove_transitive_dependencies()
+
+        self.assertEqual([0], list(graph.dependencies[1]))
+        self.assertEqual([b], a.dependant_projects)
+        self.assertEqual(2, len(a.declared_dependant_projects))
+
+    def test_compact_project_graph(self):
+        graph = slnviz.ProjectGraph()
+        a = slnviz.Project("A", "A.csproj", "".join(["A", "A"]))
+        b = slnviz.Project("B", "B.csproj", "".join(["B", "B"]))
+        c = slnviz.Project("C", "C.csproj", "".join(["C", "C"]))
+        for project in [a, b, c]:
+            graph.add_project(project)
+
+        a.add_dependency("bb")
+        a.add_dependency("cc")
+        b.add_dependency("cc")
+        graph.resolve()
+
+        # projects are slotted, GUIDs are stored once, and dependencies are
+        # only stored in the graph
+        self.assertEqual(False, hasattr(a, "__dict__"))
+        self.assertEqual(True, a.dependant_ids[0] is b.id)
+        self.assertEqual(True, a.dependant_ids[1] is b.dependant_ids[0])
+        self.assertEqual([None, None, None], [project._dependant_ids for project in [a, b, c]])
+        self.assertEqual([None, None, None], [project._dependant_projects for project in [a, b, c]])
+        self.assertEqual([b, c], a.declared_dependant_projects)
+
+        # the closure is released once the whole graph is reduced
+        slnviz.remove_transitive_dependencies(graph)
+        self.assertEqual(None, graph.closure)
+        self.assertEqual([b], a.dependant_projects)
+        self.assertEqual([b, c], a.declared_dependant_projects)
+
+        # where nothing is eliminated, declared and reduced share storage
+        self.assertEqual(True, graph.dependencies[1] is graph.declared_dependencies[1])
+
+        # and computed again when the graph is updated
+        graph.update_dependency_ids(1, [])
+        graph.update_transitive_dependencies([1])
+        self.assertEqual([b, c], a.dependant_projects)
+
+    def test_parallel_parsing_logs_warnings_in_declaration_order(self):
+        projects = [slnviz.Project("P{0}".format(i), "missing/P{0}.csproj".format(i), str(i)) for i in range(20)]
+
+        slnviz.apply_declared_project_dependencies(projects, jobs=8)
+
+        warnings = [msg.text for msg in list(slnviz.logger.messages)[-20:]]
+        for i, warning in enumerate(warnings):
+            self.assertEqual(True, warning.startswith("--Project P{0}--".format(i)))
+
+    def test_read_project_reference_ids(self):
+        xml = """<?xml version="1.0" encoding="utf-8"?>
+<Project ToolsVersion="15.0" xmlns="http://schemas.microsoft.com/developer/msbuild/2003">
+  <PropertyGroup>
+    <ProjectGuid>{11111111-1111-1111-1111-111111111111}</ProjectGuid>
+  </PropertyGroup>
+  <ItemGroup>
+    <ProjectReference Include="..\\B\\B.csproj">
+      <Project>{5a1b76e3-a314-4956-a50f-45475a5f330a}</Project>
+      <Name>B</Name>
+    </ProjectReference>
+    <ProjectReference Include="..\\C\\C.csproj">
+      <Project>{62AB4DC9-9913-4686-9F66-4BD3F4C7B119}</Project>
+    </ProjectReference>
+  </ItemGroup>
+</Project>
+"""
+        with tempfile.TemporaryDirectory() as tmp:
+            xml_proj = os.path.join(tmp, "A.csproj")
+            with open(xml_proj, "w") as f:
+                f.write(xml)
+
+            ids = slnviz.read_project_reference_ids(xml_proj)
+
+        # the project's own GUID is not a reference
+        self.assertEqual(["5A1B76E3-A314-4956-A50F-45475A5F330A", "62AB4DC9-9913-4686-9F66-4BD3F4C7B119"], ids)
+
+    def test_project_file_cache(self):
+        reference = "<Project><ItemGroup><ProjectReference><Project>{{{0}}}</Project></ProjectReference></ItemGroup></Project>"
+
+        with tempfile.TemporaryDirectory() as tmp:
+            xml_proj = os.path.join(tmp, "A.csproj")
+            cache_file = os.path.join(tmp, ".slnviz-cache")
+            with open(xml_proj, "w") as f:
+                f.write(reference.format("B"))
+
+            cache = slnviz.ProjectFileCache(cache_file)
+            self.assertEqual(["B"], cache.get_reference_ids(xml_proj))
+            self.assertEqual(None, cache.get_reference_ids(os.path.join(tmp, "missing.csproj")))
+            cache.save()
+
+            # a warm cache doesn't parse the project-file again
+            read_project_file = slnviz.read_project_file
+            slnviz.read_project_file = None
+            try:
+                cache = slnviz.ProjectFileCache(cache_file)
+                self.assertEqual(["B"], cache.get_reference_ids(xml_proj))
+            finally:
+                slnviz.read_project_file = read_project_file
+            self.assertEqual(0, cache.get_statistics()["project_files_parsed"])
+
+            # changed project-files are parsed again
+            with open(xml_proj, "w") as f:
+                f.write(reference.format("CC"))
+            self.assertEqual(["CC"], cache.get_reference_ids(xml_proj))
+
+            # and stale entries are evicted
+            cache.save()
+            os.remove(xml_proj)
+            cache = slnviz.ProjectFileCache(cache_file)
+            cache.save()
+            self.assertEqual({}, slnviz.ProjectFileCache(cache_file).entries)
+
+    def test_incremental_solution_update(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = write_solution(tmp, {"A": ["B"], "B": ["C"], "C": [], "D": ["C"]})
+            cache = slnviz.ProjectFileCache()
+            graph = slnviz.load_solution(sln_file, False, cache=cache)
+
+            # A now also has a redundant dependency on C, and on a missing project
+            write_project_file(tmp, "A", ["B", "C", "E"])
+            os.utime(os.path.join(tmp, "A.csproj"), ns=(1, 1))
+
+            self.assertEqual(True, slnviz.update_solution(graph, sln_file, False, cache=cache))
+            fresh = slnviz.load_solution(sln_file, False)
+            self.assertEqual(slnviz.render_dot_file(fresh), slnviz.render_dot_file(graph))
+            self.assertEqual(["B", "Missing_E"], [project.name for project in graph[0].dependant_projects])
+
+            # adding projects requires the solution to be loaded again
+            write_solution(tmp, {"A": ["B"], "B": ["C"], "C": [], "D": ["C"], "F": []})
+            self.assertEqual(False, slnviz.update_solution(graph, sln_file, False, cache=cache))
+
+    def test_watch_survives_files_being_saved(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = write_solution(tmp, {"A": ["B"], "B": [], "C": []})
+            moved_sln_file = os.path.join(tmp, "moved.sln")
+            graph = slnviz.load_solution(sln_file, False)
+
+            def half_written():
+                with open(os.path.join(tmp, "A.csproj"), "w") as f:
+                    f.write("<Project><ItemGroup>")
+                os.utime(os.path.join(tmp, "A.csproj"), ns=(1, 1))
+
+            def saved():
+                os.rename(moved_sln_file, sln_file)
+                write_project_file(tmp, "A", ["C"])
+                os.utime(os.path.join(tmp, "A.csproj"), ns=(2, 2))
+
+            steps = [half_written, lambda: os.rename(sln_file, moved_sln_file), saved]
+            updates = []
+
+            def on_change(projects):
+                updates.append(projects)
+                raise KeyboardInterrupt()
+
+            sleep = slnviz.time.sleep
+            slnviz.time.sleep = lambda interval: steps.pop(0)()
+            try:
+                slnviz.watch_solution(sln_file, graph, False, 1, None, 0, on_change)
+            finally:
+                slnviz.time.sleep = sleep
+
+        warnings = [msg.text for msg in slnviz.logger.messages if msg.text.startswith("Couldn't update")]
+        self.assertEqual(2, len(warnings))
+        self.assertEqual(1, len(updates))
+        self.assertEqual(["C"], [project.name for project in updates[0][0].dependant_projects])
+
+    def test_batch_keeps_solution_directories_apart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = os.path.join(tmp, "first")
+            second = os.path.join(tmp, "second")
+            os.makedirs(first)
+            os.makedirs(second)
+            # same project-files, but with different references in each directory
+            write_solution(first, {"A": ["B"], "B": []})
+            write_solution(second, {"A": [], "B": ["A"]})
+            os.rename(os.path.join(second, "test.sln"), os.path.join(second, "other.sln"))
+
+            output_dir = os.path.join(tmp, "output")
+            sln_files = slnviz.get_solution_files([os.path.join(tmp, "*", "*.sln")])
+            slnviz.process_batch(sln_files, output_dir, None, None, False, False, solution_jobs=2)
+
+            with open(os.path.join(output_dir, "test.dot")) as f:
+                self.assertEqual(True, "A -> B" in f.read())
+            with open(os.path.join(output_dir, "other.dot")) as f:
+                self.assertEqual(True, "B -> A" in f.read())
+
+    def test_batch_keeps_solutions_with_the_same_name_apart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = os.path.join(tmp, "b", "x")
+            second = os.path.join(tmp, "b", "y")
+            os.makedirs(first)
+            os.makedirs(second)
+            write_solution(first, {"A": ["B"], "B": []})
+            write_solution(second, {"A": [], "B": ["A"]})
+
+            output_dir = os.path.join(tmp, "output")
+            sln_files = slnviz.get_solution_files([os.path.join(tmp, "**", "*.sln")])
+            slnviz.process_batch(sln_files, output_dir, None, None, False, False)
+
+            self.assertEqual(["x.test.dot", "y.test.dot"], sorted(os.listdir(output_dir)))
+            with open(os.path.join(output_dir, "x.test.dot")) as f:
+                self.assertEqual(True, "A -> B" in f.read())
+            with open(os.path.join(output_dir, "y.test.dot")) as f:
+                self.assertEqual(True, "B -> A" in f.read())
+
+    def test_benchmark_generates_solution(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = benchmark.generate_solution(tmp, projects=50, fanout=3, depth=4, missing=0.1, seed=1)
+            timings = dict((phase, []) for phase in benchmark.phases)
+            counts = benchmark.run_pipeline(sln_file, timings)
+
+        self.assertEqual(True, counts["projects"] >= 50)
+        self.assertEqual(True, counts["reduced_edges"] <= counts["edges"])
+        for phase in benchmark.phases:
+            self.assertEqual(1, len(timings[phase]))
+
+    def test_benchmark_diamonds_add_transitive_references(self):
+        transitive = []
+        for diamonds in [0.0, 0.5, 1.0]:
+            with tempfile.TemporaryDirectory() as tmp:
+                sln_file = benchmark.generate_solution(tmp, projects=300, fanout=4, depth=6, diamonds=diamonds, seed=7)
+                counts = benchmark.run_pipeline(sln_file, dict((phase, []) for phase in benchmark.phases))
+            transitive.append(counts["edges"] - counts["reduced_edges"])
+
+        self.assertEqual(True, transitive[0] < transitive[1] < transitive[2])
+
+    def test_profiler_records_stages_and_counters(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = write_solution(tmp, {"A": ["B", "C"], "B": ["C"], "C": []})
+            profiler = slnviz.Profiler()
+            cache = slnviz.ProjectFileCache()
+
+            slnviz.load_solution(sln_file, False, cache=cache, profiler=profiler)
+            sln_size = os.path.getsize(sln_file)
+
+        report = profiler.get_report()
+        self.assertEqual(["parse-solution", "parse-project-files", "resolve", "reduce"], list(report["stages"]))
+        self.assertEqual(True, report["stages"]["reduce"]["wall"] >= 0)
+        self.assertEqual(3, report["counters"]["edges_declared"])
+        self.assertEqual(2, report["counters"]["edges_reduced"])
+        self.assertEqual(3, report["counters"]["closure_edges_merged"])
+        self.assertEqual(sln_size, report["counters"]["bytes_read"])
+        self.assertEqual(3, cache.get_statistics()["project_files_parsed"])
+
+        # dependencies within a reference-cycle aren't merged into a closure
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = write_solution(tmp, {"A": ["B", "C", "D"], "B": ["A"], "C": ["D"], "D": []})
+            profiler = slnviz.Profiler()
+            slnviz.load_solution(sln_file, False, profiler=profiler)
+
+        counters = profiler.get_report()["counters"]
+        self.assertEqual(4, counters["projects"])
+        self.assertEqual(5, counters["edges_declared"])
+        self.assertEqual(3, counters["closure_edges_merged"])
+
+    def test_logger_skips_disabled_messages_and_bounds_buffer(self):
+        class Unformattable(object):
+            def __format__(self, spec):
+                raise AssertionError("disabled message was formatted")
+
+        logger = slnviz.Logger(slnviz.MessageLevel.INFO, buffer_size=3, flush_size=1000)
+        logger.log(slnviz.MessageLevel.DEBUG, "{0}", (Unformattable(),))
+        for i in range(5):
+            logger.log(slnviz.MessageLevel.INFO, "message {0}", (i,))
+
+        self.assertEqual(["message 2", "message 3", "message 4"], [msg.text for msg in logger.messages])
+        self.assertEqual(2, logger.dropped)
+
+    def test_library_calls_write_buffered_console_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = write_solution(tmp, {"A": ["B"], "B": []})
+            dot_file = os.path.join(tmp, "test.dot")
+            out = io.StringIO()
+            analyzer = slnviz.Analyzer(logger=slnviz.Logger())
+            analyzer.logger.stream = out
+
+            analyzer.process(sln_file, dot_file)
+
+        self.assertEqual(True, "Wrote output-file '{0}'".format(dot_file) in out.getvalue())
+
+    def test_analyzers_run_concurrently_without_sharing_state(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = os.path.join(tmp, "first")
+            second = os.path.join(tmp, "second")
+            os.makedirs(first)
+            os.makedirs(second)
+            write_solution(first, {"A": ["B"], "B": []})
+            write_solution(second, {"A": [], "B": ["A"]})
+            os.remove(os.path.join(first, "B.csproj"))
+
+            dark = slnviz.Analyzer(style=[["bgcolor", "red"]], logger=slnviz.Logger(console=False))
+            light = slnviz.Analyzer(theme="light", logger=slnviz.Logger(console=False))
+
+            def run(analyzer, sln_file):
+                graph = analyzer.analyze(sln_file)
+                return analyzer.render(analyzer.highlight(graph, "b"))
+
+            with slnviz.ThreadPoolExecutor(max_workers=2) as executor:
+                results = list(executor.map(run, [dark, light], [os.path.join(first, "test.sln"), os.path.join(second, "test.sln")]))
+
+        self.assertEqual(True, "A -> B" in results[0] and "bgcolor=\"red\"" in results[0])
+        self.assertEqual(True, "B -> A" in results[1] and "bgcolor=\"#ffffff\"" in results[1])
+        self.assertEqual("#222222", slnviz.themes["dark"]["bgcolor"])
+        self.assertEqual(1, len([msg for msg in dark.logger.messages if msg.level == slnviz.MessageLevel.WARNING]))
+        self.assertEqual(0, len([msg for msg in light.logger.messages if msg.level == slnviz.MessageLevel.WARNING]))
+
+    def test_server_reuses_graphs_until_files_change(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = write_solution(tmp, {"A": ["B"], "B": ["C"], "C": []})
+            analyzer = slnviz.Analyzer(cache=slnviz.ProjectFileCache(), logger=slnviz.Logger(console=False))
+            server = slnviz.GraphServer(("127.0.0.1", 0), analyzer)
+            thread = slnviz.threading.Thread(target=server.serve_forever)
+            thread.start()
+
+            def get(query):
+                url = "http://127.0.0.1:{0}/graph?{1}".format(server.server_address[1], urlencode(query))
+                with urlopen(url) as response:
+                    return response.read().decode("utf-8")
+
+            try:
+                highlighted = get({"solution": sln_file, "highlight": "c"})
+                plain = get({"solution": sln_file, "exclude": "a"})
+                graph = json.loads(get({"solution": sln_file, "format": "json"}))
+
+                write_project_file(tmp, "A", ["C"])
+                os.utime(os.path.join(tmp, "A.csproj"), ns=(0, 0))
+                changed = get({"solution": sln_file})
+            finally:
+                server.shutdown()
+                server.server_close()
+                thread.join()
+
+        self.assertEqual(True, "fillcolor" in highlighted)
+        self.assertEqual(False, "fillcolor" in plain or "A [" in plain)
+        self.assertEqual([["B"], ["C"], []], [project["dependencies"] for project in graph["projects"]])
+        self.assertEqual(True, "A -> C" in changed)
+        self.assertEqual(2, server.graphs.hits)
+        self.assertEqual(2, server.graphs.loads)
+
+    def test_json_and_edge_list_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = write_solution(tmp, {"A": ["B", "C"], "B": ["C"], "C": []})
+            graph = slnviz.load_solution(sln_file, False)
+
+        out = io.StringIO()
+        slnviz.write_graph(graph, out, "json")
+        projects = json.loads(out.getvalue())["projects"]
+        self.assertEqual(["B"], projects[0]["dependencies"])
+        self.assertEqual(["B", "C"], projects[0]["declared_dependencies"])
+
+        out = io.StringIO()
+        slnviz.write_graph(graph, out, "edgelist")
+        self.assertEqual([
+            "project\tA\tA\t-",
+            "project\tB\tB\t-",
+            "project\tC\tC\t-",
+            "edge\tA\tB\tdeclared,reduced",
+            "edge\tA\tC\tdeclared",
+            "edge\tB\tC\tdeclared,reduced",
+        ], out.getvalue().splitlines())
+
+    def test_focus_only_parses_reachable_projects(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = write_solution(tmp, {"A": ["B"], "B": ["C"], "C": ["D"], "D": [], "E": ["A"]})
+            cache = slnviz.ProjectFileCache()
+
+            graph = slnviz.load_solution(sln_file, False, cache=cache, focus="b")
+            self.assertEqual(["B", "C", "D"], [project.name for project in graph])
+            self.assertEqual(3, cache.get_statistics()["project_files_parsed"])
+
+            # C is on the last level, so its project-file is never read
+            graph = slnviz.load_solution(sln_file, False, cache=slnviz.ProjectFileCache(), focus="a", depth=2)
+            self.assertEqual(["A", "B", "C"], [project.name for project in graph])
+            self.assertEqual([], graph.get_project("C").dependant_projects)
+
+    def test_scan_directory_without_solution(self):
+        project = "<Project><PropertyGroup>{0}</PropertyGroup><ItemGroup>{1}</ItemGroup></Project>"
+        guid = "<ProjectGuid>{{{0}}}</ProjectGuid>"
+        reference = "<ProjectReference Include=\"{0}\">{1}</ProjectReference>"
+        files = {
+            # references by path only, as in sdk-style projects
+            "A/A.csproj": project.format(guid.format("aaaaaaaa-0000-0000-0000-000000000000"),
+                                         reference.format("..\\B\\B.csproj", "") + reference.format("../C/C.fsproj", "")),
+            "B/B.csproj": project.format("", reference.format("..\\C\\C.fsproj", "")),
+            "C/C.fsproj": project.format("", ""),
+            "D/D.vcxproj": project.format("", reference.format("..\\Gone\\Gone.csproj", "<Project>{DDDDDDDD-0000-0000-0000-000000000000}</Project>")),
+            # build-output and packages are skipped
+            "A/bin/Debug/Copy.csproj": project.format("", ""),
+            "node_modules/x/X.csproj": project.format("", ""),
+        }
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, contents in files.items():
+                os.makedirs(os.path.dirname(os.path.join(tmp, name)), exist_ok=True)
+                with open(os.path.join(tmp, name), "w") as f:
+                    f.write(contents)
+
+            analyzer = slnviz.Analyzer(jobs=4, logger=slnviz.Logger(console=False))
+            graph = analyzer.scan(tmp)
+
+        self.assertEqual(["A", "B", "C", "D", "Missing_DDDDDDDD000000000000000000000000"], [project.name for project in graph])
+        a = graph.get_project("AAAAAAAA-0000-0000-0000-000000000000")
+        self.assertEqual(["B"], [project.name for project in a.dependant_projects])
+        self.assertEqual(["B", "C"], [project.name for project in a.declared_dependant_projects])
+        self.assertEqual(True, graph.get_project("DDDDDDDD-0000-0000-0000-000000000000").is_missing_project)
+
+    def test_exclude_early_skips_excluded_project_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # the tests are never depended on, but A reaches C through SHARED
+            sln_file = write_solution(tmp, {"A": ["SHARED", "C"], "SHARED": ["C"], "C": [],
+                                            "A.TESTS": ["A", "MISSING"], "C.TESTS": ["C"]})
+            cache = slnviz.ProjectFileCache()
+
+            graph = slnviz.load_solution(sln_file, False, cache=cache, exclude=".*tests|shared")
+            self.assertEqual(["A", "C", "SHARED"], [project.name for project in graph])
+            self.assertEqual(3, cache.get_statistics()["project_files_parsed"])
+            self.assertEqual(["SHARED"], [project.name for project in graph.get_project("A").dependant_projects])
+
+    def test_impact_index_lists_dependants_of_changed_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = benchmark.generate_solution(tmp, projects=60, fanout=3, depth=5, seed=2)
+            graph = slnviz.load_solution(sln_file, True)
+            index = slnviz.ImpactIndex(graph)
+
+            changed = [project for project in graph if project.name.startswith("Layer4.")][0]
+            changed_file = os.path.join(changed.name, "Source", "Class1.cs")
+            affected = index.get_affected([changed_file, "README.md"], tmp)
+
+        expected = [project for project in graph if project is changed or changed in project.get_nested_dependencies()]
+        self.assertEqual(expected, affected)
+        self.assertEqual([], index.get_affected(["Unknown/Class1.cs"], tmp))
+
+    def test_reports_are_written_as_text_or_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = write_solution(tmp, {"A": ["B"], "B": [], "C": []})
+            text_file = os.path.join(tmp, "affected.txt")
+            json_file = os.path.join(tmp, "schedule.json")
+
+            slnviz.process_impact(sln_file, text_file, [os.path.join(tmp, "B.csproj")])
+            slnviz.process_schedule(sln_file, json_file, report_format="json")
+
+            # all projects are in the same directory, so all own the file
+            with open(text_file) as f:
+                self.assertEqual("A\nB\nC\n", f.read())
+            with open(json_file) as f:
+                self.assertEqual(3, json.load(f)["projects"])
+
+    def test_build_schedule(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sln_file = write_solution(tmp, {"A": ["B", "D"], "B": ["C", "MISSING"], "C": [], "D": []})
+            graph = slnviz.load_solution(sln_file, True)
+
+        weights = {"A": 1.0, "B": 1.0, "C": 5.0, "D": 2.0}
+        schedule = slnviz.get_build_schedule(graph, weights)
+        self.assertEqual([["C", "D"], ["B"], ["A"]], [level["projects"] for level in schedule["levels"]])
+        self.assertEqual(["C", "B", "A"], schedule["critical_path"])
+        self.assertEqual(7.0, schedule["critical_path_weight"])
+        self.assertEqual([("C", 0.0), ("D", 0.0), ("B", 5.0), ("A", 6.0)],
+                         [(entry["name"], entry["start"]) for entry in schedule["schedule"]])
+
+        # on a single job, the longest chain is built first
+        schedule = slnviz.get_build_schedule(graph, weights, 1)
+        self.assertEqual(9.0, schedule["makespan"])
+        self.assertEqual(["C", "D", "B", "A"], [entry["name"] for entry in schedule["schedule"]])
+
+    def test_diff_two_solutions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "old"))
+            os.makedirs(os.path.join(tmp, "new"))
+            old = write_solution(os.path.join(tmp, "old"), {"A": ["B"], "B": ["C"], "C": [], "D": [], "F": ["C"]})
+            new = write_solution(os.path.join(tmp, "new"), {"A": ["C"], "B": ["C"], "C": [], "E": [], "F": ["C"]})
+            cache = slnviz.ProjectFileCache(None, True)
+
+            diff = slnviz.diff_graphs(slnviz.load_declared_graph(old, cache=cache),
+                                      slnviz.load_declared_graph(new, cache=cache))
+
+        # project-files with the same contents are only parsed once
+        self.assertEqual(3, cache.get_statistics()["project_files_parsed"])
+        self.assertEqual([("A", "changed"), ("B", "context"), ("C", "context"), ("D", "removed"), ("E", "added")],
+                         [(project["name"], project["status"]) for project in diff["projects"]])
+        self.assertEqual([("A", "B", "removed"), ("A", "C", "added")],
+                         [(edge["from"], edge["to"], edge["status"]) for edge in diff["dependencies"]])
+
+        txt = io.StringIO()
+        slnviz.write_diff(diff, txt)
+        self.assertEqual(True, "A -> B [color=\"#f22430\" style=dashed]" in txt.getvalue())
+
     def test_project_id(self):
         proj = slnviz.Project("SuperOffice.Test.Name", "stn.csproj", "123-234-345")
 
@@ -64,6 +628,43 @@ EndProject
         # has proper labels
         self.assertEqual(True, "label=\"Project.SO.Main\"" in txt)
 
+    def test_dot_file_is_streamed_to_file_objects(self):
+        proj1 = slnviz.Project("Project.SO.Main", "psomain.csproj", "123-234")
+        proj2 = slnviz.Project("Project.SO.Installer", "psoinstaller.vcxproj", "234-345")
+        proj1.dependant_projects = [proj2]
+
+        with tempfile.TemporaryFile("w+") as f:
+            slnviz.write_dot_file([proj1, proj2], f)
+            f.seek(0)
+            txt = f.read()
+
+        self.assertEqual(slnviz.render_dot_file([proj1, proj2]), txt)
+        self.assertEqual(True, "Project_SO_Main -> Project_SO_Installer" in txt)
+
+    def test_collapse_and_cluster_by_name_prefix(self):
+        core = slnviz.Project("Company.Core", "core.csproj", "1")
+        core_tests = slnviz.Project("Company.Core.Tests", "core.tests.csproj", "2")
+        web = slnviz.Project("Company.Web.Site", "site.csproj", "3")
+        web_api = slnviz.Project("Company.Web.Api", "api.csproj", "4")
+        tool = slnviz.Project("Tool", "tool.csproj", "5")
+        core_tests.dependant_projects = [core]
+        web.dependant_projects = [web_api, core]
+        web_api.dependant_projects = [core]
+        tool.dependant_projects = [web, web_api]
+        for project in [core, core_tests, web, web_api, tool]:
+            project.declared_dependant_projects = project.dependant_projects
+        web_api.highlight = True
+
+        collapsed = slnviz.collapse_projects([core, core_tests, web, web_api, tool], 2)
+        self.assertEqual(["Company.Core", "Company.Web", "Tool"], [project.name for project in collapsed])
+        self.assertEqual([[], ["Company.Core"], ["Company.Web"]],
+                         [[dep.name for dep in project.dependant_projects] for project in collapsed])
+        self.assertEqual([False, True, False], [project.highlight for project in collapsed])
+
+        txt = slnviz.render_dot_file([core, core_tests, web, web_api, tool], cluster=2)
+        self.assertEqual(True, "subgraph cluster_Company_Web {" in txt)
+        self.assertEqual(False, "cluster_Tool" in txt)
+
     def test_eliminate_dependencies(self):
         a = slnviz.Project("A", "A.csproj", "A")
         b = slnviz.Project("B", "B.csproj", "B")
@@ -82,6 +683,39 @@ EndProject
         self.assertEqual([c], b.dependant_projects)
         self.assertEqual([d], c.dependant_projects)
 
+    def test_transitive_closure(self):
+        # 0 -> 1 -> 2 -> 3, and 0 -> 3
+        adjacency = [[1, 3], [2], [3], []]
+
+        closure = slnviz.get_transitive_closure(adjacency)
+
+        self.assertEqual(0b1110, closure[0])
+        self.assertEqual(0b1100, closure[1])
+        self.assertEqual(0b1000, closure[2])
+        self.assertEqual(0, closure[3])
+        self.assertEqual([[1], [2], [3], []], slnviz.get_transitive_reduction(adjacency, closure))
+
+    def test_eliminate_dependencies_in_diamond_chain(self):
+        # a long chain of diamonds, where every layer also depends directly
+        # on the bottom. without a shared closure this takes exponential time.
+        bottom = slnviz.Project("Bottom", "Bottom.csproj", "Bottom")
+        projects = [bottom]
+        layer = []
+        for i in range(40):
+            left = slnviz.Project("L{0}".format(i), "L.csproj", "L{0}".format(i))
+            right = slnviz.Project("R{0}".format(i), "R.csproj", "R{0}".format(i))
+            left.dependant_projects = layer + [bottom]
+            right.dependant_projects = layer + [bottom]
+            projects += [left, right]
+            layer = [left, right]
+
+        slnviz.remove_transitive_dependencies(projects)
+
+        self.assertEqual([], bottom.dependant_projects)
+        self.assertEqual([bottom], projects[1].dependant_projects)
+        self.assertEqual(projects[1:3], projects[3].dependant_projects)
+        self.assertEqual(projects[-4:-2], projects[-1].dependant_projects)
+
     def test_dependency_chains(self):
         a = slnviz.Project("A", "A.csproj", "A")
         b = slnviz.Project("B", "B.csproj", "B")
@@ -95,6 +729,34 @@ EndProject
         all_deps = a.get_nested_dependencies()
         self.assertEqual([b, c, d], all_deps)
 
+    def test_dependency_cycles(self):
+        # A -> B -> C -> B, with A -> C and C -> D, and a chain too deep to recurse
+        a = slnviz.Project("A", "A.csproj", "A")
+        b = slnviz.Project("B", "B.csproj", "B")
+        c = slnviz.Project("C", "C.csproj", "C")
+        d = slnviz.Project("D", "D.csproj", "D")
+        a.dependant_projects = [b, c]
+        b.dependant_projects = [c]
+        c.dependant_projects = [b, d]
+
+        self.assertEqual([b, c, d], a.get_nested_dependencies())
+
+        chain = [slnviz.Project("P{0}".format(i), "P.csproj", str(i)) for i in range(5000)]
+        for project, dep in zip(chain, chain[1:]):
+            project.dependant_projects = [dep]
+        self.assertEqual(4999, len(chain[0].get_nested_dependencies()))
+
+        self.assertEqual([[3], [2, 1], [0]], slnviz.get_strongly_connected_components([[1, 2], [2], [1, 3], []]))
+
+        slnviz.remove_transitive_dependencies([a, b, c, d])
+
+        # edges within the cycle are kept, A -> C is reached through the cycle
+        self.assertEqual([b], a.dependant_projects)
+        self.assertEqual([c], b.dependant_projects)
+        self.assertEqual([b, d], c.dependant_projects)
+        self.assertEqual(True, b.cycle is not None and b.cycle == c.cycle)
+        self.assertEqual(None, a.cycle)
+
     def test_project_highlighting(self):
         a = slnviz.Project("A", "A.csproj", "A")
         b1 = slnviz.Project("B1", "B1.csproj", "B1")
@@ -111,6 +773,28 @@ EndProject
         self.assertEqual(False, b2.has_highlighted_dependencies())
         self.assertEqual(False, c.has_highlighted_dependencies())
 
+    def test_highlighted_dependencies_are_computed_once_for_the_graph(self):
+        a = slnviz.Project("A", "A.csproj", "A")
+        b1 = slnviz.Project("B1", "B1.csproj", "B1")
+        b2 = slnviz.Project("B2", "B2.csproj", "B2")
+        c = slnviz.Project("C", "C.csproj", "C")
+        d = slnviz.Project("D", "D.csproj", "D")
+
+        a.dependant_projects = [b1, b2]
+        b1.dependant_projects = [c]
+        c.dependant_projects = [d]
+        a.declared_dependant_projects = [b1, b2, c]
+        b1.declared_dependant_projects = [c]
+
+        c.highlight = True
+
+        self.assertEqual({a, b1, c}, slnviz.get_highlighted_dependencies([a, b1, b2, c, d]))
+        self.assertEqual({a, b1, c}, slnviz.get_highlighted_dependencies([a, b1, b2, c, d], True))
+
+        b1.declared_dependant_projects = []
+        self.assertEqual({a, c}, slnviz.get_highlighted_dependencies([a], False))
+        self.assertEqual({a, b1, c}, slnviz.get_highlighted_dependencies([a], True))
+
     def test_declared_dependencies_generates_highlight_even_though_dependency_is_eliminated_as_transitive(self):
         a = slnviz.Project("A", "A.csproj", "A")
         b = slnviz.Project("B", "B.csproj", "B")